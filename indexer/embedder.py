@@ -3,9 +3,9 @@
 import asyncio
 import hashlib
 import logging
-import struct
 from typing import List, Dict, Optional, Tuple
 import httpx
+import numpy as np
 from openai import AsyncOpenAI
 from models import EmbeddingCache, IndexerMetrics
 from db import DatabaseManager
@@ -13,6 +13,32 @@ from settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on rows mirrored in the in-memory vector matrix (daemon safety);
+# 4096 rows of 3072-dim float32 is 48 MiB
+CACHE_MATRIX_MAX_ROWS = 4096
+
+
+def compute_text_hash(text: str, model: str, lang: Optional[str] = None) -> str:
+    """Content hash shared by the embedding cache key and ``Chunk.text_hash``."""
+    cache_key = f"{text}|{model}|{settings.chunking_version}|{settings.preprocess_version}|{lang or ''}"
+    return hashlib.sha256(cache_key.encode()).hexdigest()
+
+
+def encode_cached_vector(vector: np.ndarray) -> bytes:
+    """Serialize a vector for the embedding cache as float16 bytes."""
+    return vector.astype(np.float16).tobytes()
+
+
+def decode_cached_vector(data: bytes, dim: int) -> np.ndarray:
+    """Decode a cached vector as float32.
+
+    Rows written before the float16 switch hold float32 and are told apart
+    by their byte length.
+    """
+    if len(data) == dim * 2:
+        return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+    return np.frombuffer(data, dtype=np.float32)
+
 
 class Embedder:
     """Handles text embedding with caching and batching."""
@@ -56,10 +82,35 @@ class Embedder:
             "text-embedding-ada-002": 1536,
         }
 
+        # In-memory SoA mirror of known vectors: one contiguous float32 matrix
+        # plus a text_hash -> row index. Rebuilt when the vector dim changes.
+        self._cache_matrix: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._cache_row_of: Dict[str, int] = {}
+
+    def _remember_vector(self, text_hash: str, vector: np.ndarray) -> None:
+        """Store a vector in the in-memory matrix, growing it by doubling."""
+        dim = vector.shape[0]
+        if self._cache_matrix.shape[1] != dim:
+            self._cache_matrix = np.empty((0, dim), dtype=np.float32)
+            self._cache_row_of = {}
+
+        row = self._cache_row_of.get(text_hash)
+        if row is None:
+            row = len(self._cache_row_of)
+            if row >= CACHE_MATRIX_MAX_ROWS:
+                return
+            capacity = self._cache_matrix.shape[0]
+            if row >= capacity:
+                new_capacity = min(max(16, capacity * 2), CACHE_MATRIX_MAX_ROWS)
+                grown = np.empty((new_capacity, dim), dtype=np.float32)
+                grown[:capacity] = self._cache_matrix
+                self._cache_matrix = grown
+            self._cache_row_of[text_hash] = row
+        self._cache_matrix[row] = vector
+
     def _compute_text_hash(self, text: str, lang: Optional[str] = None) -> str:
         """Compute hash for text caching."""
-        cache_key = f"{text}|{self.model}|{settings.chunking_version}|{settings.preprocess_version}|{lang or ''}"
-        return hashlib.sha256(cache_key.encode()).hexdigest()
+        return compute_text_hash(text, self.model, lang)
 
     @staticmethod
     def _coerce_float(value, default: float) -> float:
@@ -73,16 +124,11 @@ class Embedder:
         except Exception:
             return default
 
-    def _vector_to_bytes(self, vector: List[float]) -> bytes:
-        """Convert vector to bytes for storage."""
-        return struct.pack(f"{len(vector)}f", *vector)
-
-    def _bytes_to_vector(self, data: bytes) -> List[float]:
-        """Convert bytes back to vector."""
-        return list(struct.unpack(f"{len(data)//4}f", data))
-
     async def embed_texts(
-        self, texts: List[str], dry_run: bool = False
+        self,
+        texts: List[str],
+        dry_run: bool = False,
+        text_hashes: Optional[List[str]] = None,
     ) -> List[Tuple[str, List[float]]]:
         """
         Embed multiple texts with caching and batching.
@@ -90,6 +136,7 @@ class Embedder:
         Args:
             texts: List of texts to embed
             dry_run: If True, only estimate cost without calling API
+            text_hashes: Precomputed ``compute_text_hash`` values for ``texts``
 
         Returns:
             List of (text_hash, vector) tuples
@@ -101,13 +148,23 @@ class Embedder:
         results = []
         texts_to_embed = []
 
-        for text in texts:
-            text_hash = self._compute_text_hash(text)
+        if text_hashes is None:
+            text_hashes = [self._compute_text_hash(text) for text in texts]
+
+        for text, text_hash in zip(texts, text_hashes, strict=True):
+            row = self._cache_row_of.get(text_hash)
+            if row is not None:
+                # Vectors seen earlier in this process skip the DB round trip
+                results.append((text_hash, self._cache_matrix[row].tolist()))
+                self.metrics.embed_cached_hits += 1
+                continue
+
             cached = await self.db.get_cached_embedding(text_hash)
 
             if cached and cached.model == self.model:
-                vector = self._bytes_to_vector(cached.vector)
-                results.append((text_hash, vector))
+                array = decode_cached_vector(cached.vector, cached.dim)
+                self._remember_vector(text_hash, array)
+                results.append((text_hash, array.tolist()))
                 self.metrics.embed_cached_hits += 1
             else:
                 texts_to_embed.append((text, text_hash))
@@ -165,13 +222,15 @@ class Embedder:
         for batch_result in batch_results:
             for text_hash, vector in batch_result:
                 results.append((text_hash, vector))
+                array = np.asarray(vector, dtype=np.float32)
+                self._remember_vector(text_hash, array)
 
                 # Cache the embedding
                 cache_entry = EmbeddingCache(
                     text_hash=text_hash,
                     model=self.model,
                     dim=len(vector),
-                    vector=self._vector_to_bytes(vector),
+                    vector=encode_cached_vector(array),
                     chunking_version=settings.chunking_version,
                     preprocess_version=settings.preprocess_version,
                 )
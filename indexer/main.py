@@ -12,7 +12,6 @@ import sys
 from contextlib import suppress
 from datetime import datetime, timedelta
 from typing import Any, Callable, Dict, List, Optional, Tuple
-import hashlib
 
 from telethon import events
 
@@ -21,10 +20,10 @@ from db import DatabaseManager
 from telethon_client import TelethonClientWrapper
 from normalize import normalize_text, create_header, compose_message_with_reply
 from chunker import TextChunker
-from embedder import Embedder
+from embedder import Embedder, compute_text_hash
 from vespa_client import VespaClient
 from cost import CostEstimator
-from models import Chunk, VespaDocument, IndexerMetrics
+from models import Chunk, VespaDocument, IndexerMetrics, VectorValues
 from state import BackfillStateStore
 
 logger = logging.getLogger(__name__)
@@ -96,6 +95,7 @@ class TelegramIndexer:
         # Check Vespa health
         if not await self.vespa_client.health_check():
             logger.warning("Vespa health check failed - documents may not be indexed")
+        await self.vespa_client.start_keepalive()
 
         logger.info("Indexer initialized successfully")
 
@@ -103,9 +103,14 @@ class TelegramIndexer:
         """Clean up resources."""
         logger.info("Cleaning up...")
 
-        await self.tg_client.stop()
-        await self.vespa_client.close()
-        await self.db.close()
+        try:
+            # First, so pending backfill progress is written even if closing
+            # one of the clients below fails
+            await self.backfill_state.close()
+        finally:
+            await self.tg_client.stop()
+            await self.vespa_client.close()
+            await self.db.close()
 
     async def _prepare_target_chats(
         self, mode: str
@@ -675,6 +680,7 @@ class TelegramIndexer:
         # Process each chunk
         chunk_objects = []
         texts_to_embed = []
+        text_hashes = []
 
         for chunk_idx, (full_text, chunk_bm25_text) in enumerate(chunks):
             # Create chunk ID
@@ -682,10 +688,8 @@ class TelegramIndexer:
                 f"{chat_id}:{message_id}:{chunk_idx}:v{settings.chunking_version}"
             )
 
-            # Compute text hash for caching
-            text_hash = hashlib.sha256(
-                f"{full_text}|{settings.embed_model}|{settings.chunking_version}|{settings.preprocess_version}".encode()
-            ).hexdigest()
+            # Same hash the embedder uses as its cache key
+            text_hash = compute_text_hash(full_text, self.embedder.model)
 
             # Create chunk object
             chunk_obj = Chunk(
@@ -706,9 +710,12 @@ class TelegramIndexer:
 
             chunk_objects.append(chunk_obj)
             texts_to_embed.append(full_text)
+            text_hashes.append(text_hash)
 
         # Get embeddings
-        embeddings = await self.embedder.embed_texts(texts_to_embed, self.args.dry_run)
+        embeddings = await self.embedder.embed_texts(
+            texts_to_embed, self.args.dry_run, text_hashes=text_hashes
+        )
 
         if self.args.dry_run:
             logger.info(
@@ -720,7 +727,7 @@ class TelegramIndexer:
         vespa_docs = []
         for chunk_obj, (text_hash, vector) in zip(chunk_objects, embeddings):
             # Determine which vector field to use based on embedding dimensions
-            vector_dict = {"values": vector}
+            vector_dict: VectorValues = {"values": vector}
             if settings.embed_dimensions == 1536:
                 vector_small = vector_dict
                 vector_large = None
@@ -987,10 +994,20 @@ async def main():
             logger.info("Daemon interrupted; shutting down")
 
 
+def _install_uvloop() -> None:
+    """Run on uvloop when it is installed; it is not available on Windows."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    uvloop.install()
+
+
 def entrypoint():
     """Entry point for setuptools."""
+    _install_uvloop()
     asyncio.run(main())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    entrypoint()
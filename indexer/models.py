@@ -1,22 +1,43 @@
 """Database models for indexer."""
 
-from typing import Optional
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, TypedDict
 
+import msgspec
+import numpy as np
 
-class EmbeddingCache(BaseModel):
+
+class _Model(msgspec.Struct):
+    """Base for indexer models: msgspec Struct with a pydantic-style dump.
+
+    Structs are slotted (no per-instance ``__dict__``). Records that are built
+    once and only read are declared ``frozen=True``; ``IndexerMetrics`` is
+    accumulated in place and stays mutable.
+    """
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Return the model as a plain dict."""
+        return msgspec.structs.asdict(self)
+
+
+class EmbeddingCache(_Model, kw_only=True, frozen=True):
     """Cached embedding for text."""
 
     text_hash: str
     model: str
     dim: int
-    vector: bytes  # float32 array as bytes
+    vector: bytes  # float16 array as bytes (float32 in older rows)
     lang: Optional[str] = None
     chunking_version: int
     preprocess_version: int
 
 
-class Chunk(BaseModel):
+class VectorValues(TypedDict):
+    """Vespa tensor payload for a dense vector field."""
+
+    values: List[float]
+
+
+class Chunk(_Model, kw_only=True, frozen=True):
     """Processed message chunk."""
 
     chunk_id: str
@@ -35,7 +56,48 @@ class Chunk(BaseModel):
     has_link: bool = False
 
 
-class VespaDocument(BaseModel):
+class HexVectorValues(TypedDict):
+    """Vespa dense tensor payload with all cells as one hex string."""
+
+    values: str
+
+
+def _hex_tensor(vector: Optional[VectorValues]) -> Optional[HexVectorValues]:
+    """Encode vector values in Vespa's hex form for ``tensor<float>`` cells.
+
+    Big-endian float32 is 8 hex characters per cell, versus ~19 for a float
+    printed as JSON text, and float32 is what Vespa stores anyway.
+    """
+    if not vector:
+        return None
+    cells = np.asarray(vector["values"], dtype=">f4")
+    return {"values": cells.tobytes().hex().upper()}
+
+
+class VespaFields(msgspec.Struct, omit_defaults=True, frozen=True):
+    """Field payload of a Vespa document put; absent vectors are omitted."""
+
+    id: str
+    text: str
+    bm25_text: str
+    chat_id: str
+    message_id: int
+    chunk_idx: int
+    source_title: str
+    sender: str
+    sender_username: str
+    chat_username: str
+    chat_type: str
+    message_date: int
+    edit_date: Optional[int]
+    thread_id: Optional[int]
+    has_link: bool
+    date: int  # For backward compatibility
+    vector_small: Optional[HexVectorValues] = None
+    vector_large: Optional[HexVectorValues] = None
+
+
+class VespaDocument(_Model, kw_only=True, frozen=True):
     """Vespa document structure."""
 
     id: str
@@ -54,11 +116,34 @@ class VespaDocument(BaseModel):
     has_link: bool = False
     text: str
     bm25_text: str
-    vector_small: Optional[dict] = None  # {"values": [float, ...]} for 1536-dim
-    vector_large: Optional[dict] = None  # {"values": [float, ...]} for 3072-dim
+    vector_small: Optional[VectorValues] = None  # 1536-dim
+    vector_large: Optional[VectorValues] = None  # 3072-dim
+
+    def to_vespa_fields(self) -> VespaFields:
+        """Map to the field payload Vespa's document API expects."""
+        return VespaFields(
+            id=self.id,
+            text=self.text,
+            bm25_text=self.bm25_text,
+            chat_id=self.chat_id,
+            message_id=self.message_id,
+            chunk_idx=self.chunk_idx,
+            source_title=self.source_title or "",
+            sender=self.sender or "",
+            sender_username=self.sender_username or "",
+            chat_username=self.chat_username or "",
+            chat_type=self.chat_type or "",
+            message_date=self.message_date,
+            edit_date=self.edit_date,
+            thread_id=self.thread_id,
+            has_link=self.has_link,
+            date=self.message_date,
+            vector_small=_hex_tensor(self.vector_small),
+            vector_large=_hex_tensor(self.vector_large),
+        )
 
 
-class IndexerMetrics(BaseModel):
+class IndexerMetrics(_Model, kw_only=True):
     """Runtime metrics."""
 
     messages_scanned: int = 0
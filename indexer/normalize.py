@@ -2,11 +2,15 @@
 
 import re
 import logging
+import sys
+import time
+from functools import lru_cache
 from typing import Optional, Tuple
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+_URL_RE = re.compile(r"https?://", re.IGNORECASE)
+
 
 def normalize_text(text: str) -> Tuple[str, str, bool]:
     """
@@ -18,14 +22,16 @@ def normalize_text(text: str) -> Tuple[str, str, bool]:
     if not text:
         return "", "", False
 
-    # Detect links
-    has_link = bool(re.search(r"https?://", text, re.IGNORECASE))
+    # Detect links; the substring prefilter skips the regex for link-free text
+    has_link = "://" in text and _URL_RE.search(text) is not None
 
-    # Keep original URLs for BM25 indexing (previously replaced with <URL>)
-    bm25_text = re.sub(r"\s+", " ", text).strip()
+    # Keep original URLs for BM25 indexing (previously replaced with <URL>).
+    # str.split() uses the same whitespace set as the regex \s, but collapsing
+    # runs this way stays entirely in C.
+    bm25_text = " ".join(text.split())
 
-    # For display text, keep original but clean up whitespace
-    display_text = re.sub(r"\s+", " ", text).strip()
+    # For display text, keep original but clean up whitespace (same result)
+    display_text = bm25_text
 
     return display_text, bm25_text, has_link
 
@@ -34,9 +40,8 @@ def create_header(
     sender: Optional[str], sender_username: Optional[str], message_date: int
 ) -> str:
     """Create message header with date and sender."""
-    # Convert epoch to formatted date
-    dt = datetime.fromtimestamp(message_date)
-    date_str = dt.strftime("%Y-%m-%d %H:%M")
+    # Convert epoch to formatted date (cached per minute; busy chats repeat it)
+    date_str = _format_minute(int(message_date) // 60)
 
     # Format sender
     if sender_username:
@@ -49,6 +54,16 @@ def create_header(
     return f"[{date_str} • {sender_str}]"
 
 
+@lru_cache(maxsize=4096)
+def _format_minute(epoch_minute: int) -> str:
+    """Format an epoch minute as local ``YYYY-MM-DD HH:MM``."""
+    t = time.localtime(epoch_minute * 60)
+    return (
+        f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} "
+        f"{t.tm_hour:02d}:{t.tm_min:02d}"
+    )
+
+
 def compose_message_with_reply(
     main_text: str, reply_text: Optional[str] = None, max_reply_tokens: int = 120
 ) -> str:
@@ -70,21 +85,37 @@ def compose_message_with_reply(
     max_reply_chars = max_reply_tokens * 4
 
     if len(reply_text) > max_reply_chars:
-        reply_text = reply_text[:max_reply_chars].rsplit(" ", 1)[0] + "..."
+        # Cut at the last space inside the budget without copying the prefix first
+        cut = reply_text.rfind(" ", 0, max_reply_chars)
+        if cut == -1:
+            cut = max_reply_chars
+        reply_text = reply_text[:cut] + "..."
 
     return f"{reply_text}\n\n——\n\n{main_text}"
 
 
+# Indexed by (megagroup << 2) | (channel << 1) | has_user_id; the literals are
+# interned, so every chunk shares the same four chat_type strings
+_CHAT_TYPE_LUT = (
+    "unknown",
+    "private",
+    "channel",
+    "channel",
+    "group",
+    "group",
+    "group",
+    "group",
+)
+
+
 def extract_chat_type(chat) -> str:
     """Extract chat type from Telethon chat object."""
-    if hasattr(chat, "megagroup") and chat.megagroup:
-        return "group"
-    elif hasattr(chat, "channel") and chat.channel:
-        return "channel"
-    elif hasattr(chat, "user_id"):
-        return "private"
-    else:
-        return "unknown"
+    idx = (
+        (bool(getattr(chat, "megagroup", False)) << 2)
+        | (bool(getattr(chat, "channel", False)) << 1)
+        | hasattr(chat, "user_id")
+    )
+    return _CHAT_TYPE_LUT[idx]
 
 
 def format_sender_name(sender) -> Tuple[Optional[str], Optional[str]]:
@@ -92,16 +123,27 @@ def format_sender_name(sender) -> Tuple[Optional[str], Optional[str]]:
     if not sender:
         return None, None
 
+    return _format_sender_cached(
+        getattr(sender, "first_name", None) or None,
+        getattr(sender, "last_name", None) or None,
+        getattr(sender, "username", None) or None,
+    )
+
+
+@lru_cache(maxsize=4096)
+def _format_sender_cached(
+    first_name: Optional[str], last_name: Optional[str], username: Optional[str]
+) -> Tuple[Optional[str], Optional[str]]:
+    """Build ``(full_name, username)``; keyed on the raw fields per sender."""
     # Get full name
     full_name = None
-    if hasattr(sender, "first_name") and sender.first_name:
-        full_name = sender.first_name
-        if hasattr(sender, "last_name") and sender.last_name:
-            full_name += f" {sender.last_name}"
-
-    # Get username
-    username = None
-    if hasattr(sender, "username") and sender.username:
-        username = sender.username
+    if first_name:
+        full_name = first_name
+        if last_name:
+            full_name += f" {last_name}"
+
+    # Interned since the same handful of usernames repeat across every chunk
+    if username is not None:
+        username = sys.intern(username)
 
     return full_name, username
@@ -31,6 +31,8 @@ class Settings(BaseSettings):
 
     # Vespa
     vespa_endpoint: str = "http://vespa:8080"
+    vespa_content_cluster: str = "content"
+    vespa_compress_feed: bool = False  # gzip feed bodies
 
     # Chunking
     chunking_version: int = 1
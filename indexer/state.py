@@ -3,11 +3,25 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import logging
+import os
+from contextlib import suppress
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+import msgspec
+
+logger = logging.getLogger(__name__)
+
+# Progress is kept in memory and flushed every FLUSH_INTERVAL_S as appended
+# log lines, which are folded into the JSON snapshot every COMPACT_EVERY
+# lines (and on close).
+FLUSH_INTERVAL_S = 0.5
+# Pause before retrying a background flush that failed
+FLUSH_RETRY_S = 5.0
+COMPACT_EVERY = 1000
 
 
 @dataclass
@@ -19,43 +33,101 @@ class BackfillRecord:
     updated_at: str
 
 
+class _ChatStateEntry(msgspec.Struct):
+    """On-disk shape of one chat's progress."""
+
+    last_message_id: int = 0
+    updated_at: Optional[str] = None
+
+
+class _StateFile(msgspec.Struct):
+    """On-disk shape of the whole state file."""
+
+    chats: Dict[str, _ChatStateEntry] = {}
+
+
+class _LogEntry(msgspec.Struct):
+    """One appended progress line: chat, message id, timestamp."""
+
+    c: str
+    m: int
+    t: Optional[str] = None
+
+
+_decoder = msgspec.json.Decoder(_StateFile, strict=False)
+_encoder = msgspec.json.Encoder(order="sorted")
+_log_decoder = msgspec.json.Decoder(_LogEntry, strict=False)
+_log_encoder = msgspec.json.Encoder()
+
+
 class BackfillStateStore:
-    """Persist per-chat backfill progress to a JSON file."""
+    """Persist per-chat backfill progress to a JSON file.
+
+    Updates land in memory and are flushed in the background as lines
+    appended to ``<name>.log`` next to the snapshot, which is replayed on
+    load. Call ``close()`` (or ``flush()``) to make pending progress durable.
+    """
 
     def __init__(self, path: str):
         self.path = Path(path)
+        self.log_path = self.path.with_suffix(".log")
         self._lock = asyncio.Lock()
         self._state: Dict[str, BackfillRecord] = {}
         self._loaded = False
+        self._has_snapshot = False
+        self._dirty: Dict[str, BackfillRecord] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._log_fd: Optional[int] = None
+        self._appended = 0
 
     async def load(self) -> None:
         """Load state from disk if present."""
         if self._loaded:
             return
 
-        if not self.path.exists():
-            self.path.parent.mkdir(parents=True, exist_ok=True)
-            self._loaded = True
-            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
 
         try:
-            content = await asyncio.to_thread(self.path.read_text)
-            data = json.loads(content)
-            chats = data.get("chats", {}) if isinstance(data, dict) else {}
-            for chat_id, record in chats.items():
-                last_message_id = int(record.get("last_message_id", 0))
-                updated_at = str(record.get("updated_at", _now_iso()))
+            content = await asyncio.to_thread(self.path.read_bytes)
+            data = _decoder.decode(content)
+            for chat_id, record in data.chats.items():
                 self._state[chat_id] = BackfillRecord(
                     chat_id=chat_id,
-                    last_message_id=last_message_id,
-                    updated_at=updated_at,
+                    last_message_id=record.last_message_id,
+                    updated_at=record.updated_at or _now_iso(),
                 )
-        except FileNotFoundError:
-            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._has_snapshot = True
         except Exception:
-            self.path.parent.mkdir(parents=True, exist_ok=True)
-        finally:
-            self._loaded = True
+            # Missing or unreadable snapshot; start from whatever the log has.
+            pass
+
+        try:
+            log_content = await asyncio.to_thread(self.log_path.read_bytes)
+        except FileNotFoundError:
+            log_content = b""
+        self._replay_log(log_content)
+
+        self._loaded = True
+
+    def _replay_log(self, content: bytes) -> None:
+        for line in content.splitlines():
+            if not line:
+                continue
+            try:
+                entry = _log_decoder.decode(line)
+            except msgspec.DecodeError:
+                # A torn final line after a crash; earlier lines still count.
+                logger.warning("Skipping unreadable line in %s", self.log_path)
+                continue
+            existing = self._state.get(entry.c)
+            if existing and existing.last_message_id >= entry.m:
+                continue
+            self._state[entry.c] = BackfillRecord(
+                chat_id=entry.c,
+                last_message_id=entry.m,
+                updated_at=entry.t or _now_iso(),
+            )
+            self._appended += 1
 
     async def get_last_message_id(self, chat_id: str) -> Optional[int]:
         """Return the last processed message ID for a chat."""
@@ -64,41 +136,131 @@ class BackfillStateStore:
         return record.last_message_id if record else None
 
     async def update_chat(self, chat_id: str, message_id: int) -> None:
-        """Persist progress for a chat."""
+        """Record progress for a chat; it is written on the next flush."""
         await self.load()
 
+        existing = self._state.get(chat_id)
+        if existing and existing.last_message_id >= message_id:
+            # No progress to persist.
+            return
+
+        record = BackfillRecord(
+            chat_id=chat_id,
+            last_message_id=message_id,
+            updated_at=_now_iso(),
+        )
+        self._state[chat_id] = record
+        self._dirty[chat_id] = record
+
+        if not self._has_snapshot:
+            # Write the initial snapshot right away so the file always exists
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Write pending progress to disk."""
         async with self._lock:
-            existing = self._state.get(chat_id)
-            if existing and existing.last_message_id >= message_id:
-                # No progress to persist.
+            if not self._dirty:
                 return
+            records = dict(self._dirty)
 
-            record = BackfillRecord(
-                chat_id=chat_id,
-                last_message_id=message_id,
-                updated_at=_now_iso(),
-            )
-            self._state[chat_id] = record
-            await self._persist()
+            if not self._has_snapshot or self._appended >= COMPACT_EVERY:
+                await self._compact()
+            else:
+                await self._append(list(records.values()))
+
+            # Only now are the records durable; on failure they stay pending
+            for chat_id, record in records.items():
+                if self._dirty.get(chat_id) is record:
+                    del self._dirty[chat_id]
+
+    async def close(self) -> None:
+        """Fold pending progress and the log into the snapshot and release it."""
+        task, self._flush_task = self._flush_task, None
+
+        # Waiting for the lock lets a flush already writing finish first, or
+        # it would race the snapshot rewrite below on the same file
+        async with self._lock:
+            if task is not None:
+                # With the lock held the task is sleeping or queued on the
+                # lock, never mid-write, so cancelling it is safe
+                task.cancel()
+            try:
+                if self._dirty or self._appended:
+                    # The snapshot covers pending records, so skip the append
+                    await self._compact()
+                    self._dirty.clear()
+            finally:
+                self._close_log()
+
+        if task is not None:
+            with suppress(asyncio.CancelledError):
+                await task
 
     async def snapshot(self) -> Dict[str, BackfillRecord]:
         """Return a copy of the in-memory state."""
         await self.load()
         return dict(self._state)
 
+    async def _flush_later(self) -> None:
+        # Keep going until nothing is pending: updates that land while a
+        # flush is writing, or after one failed, get no task of their own
+        delay = FLUSH_INTERVAL_S
+        while self._dirty:
+            await asyncio.sleep(delay)
+            try:
+                await self.flush()
+                delay = FLUSH_INTERVAL_S
+            except Exception:
+                logger.exception("Background flush of %s failed", self.path)
+                delay = FLUSH_RETRY_S
+
+    async def _append(self, records: List[BackfillRecord]) -> None:
+        lines = b"".join(
+            _log_encoder.encode(
+                _LogEntry(
+                    c=record.chat_id, m=record.last_message_id, t=record.updated_at
+                )
+            )
+            + b"\n"
+            for record in records
+        )
+        if self._log_fd is None:
+            self._log_fd = os.open(
+                self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+            )
+        os.write(self._log_fd, lines)
+        await asyncio.to_thread(os.fsync, self._log_fd)
+        self._appended += len(records)
+
+    async def _compact(self) -> None:
+        # Snapshot first: if we die before the log is removed, replaying it
+        # again is harmless because only forward progress is applied.
+        await self._persist()
+        self._has_snapshot = True
+        self._close_log()
+        self.log_path.unlink(missing_ok=True)
+        self._appended = 0
+
+    def _close_log(self) -> None:
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+            self._log_fd = None
+
     async def _persist(self) -> None:
-        payload = {
-            "chats": {
-                chat_id: {
-                    "last_message_id": record.last_message_id,
-                    "updated_at": record.updated_at,
-                }
+        payload = _StateFile(
+            chats={
+                chat_id: _ChatStateEntry(
+                    last_message_id=record.last_message_id,
+                    updated_at=record.updated_at,
+                )
                 for chat_id, record in self._state.items()
             }
-        }
+        )
 
-        content = json.dumps(payload, indent=2, sort_keys=True)
-        await asyncio.to_thread(self.path.write_text, content)
+        content = msgspec.json.format(_encoder.encode(payload), indent=2)
+        await asyncio.to_thread(self.path.write_bytes, content)
 
 
 def _now_iso() -> str:
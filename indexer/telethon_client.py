@@ -17,12 +17,39 @@ from telethon.tl.types import (
     MessageActionChatAddUser,
 )
 from telethon.errors import FloodWaitError, SessionPasswordNeededError
+import msgspec
 from settings import settings
 from normalize import format_sender_name, extract_chat_type
 
 logger = logging.getLogger(__name__)
 
 
+class _StubUser(msgspec.Struct):
+    """Sender shape produced by the stub client."""
+
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    username: Optional[str] = None
+
+
+class _StubMessage(msgspec.Struct):
+    """Minimal message shape the indexer reads; used by the stub client."""
+
+    id: int
+    text: str
+    date: datetime
+    sender: Optional[_StubUser] = None
+    edit_date: Optional[datetime] = None
+    reply_to_msg_id: Optional[int] = None
+    forward: Any = None
+    action: Any = None
+    media: Any = None
+
+
+_STUB_SENDER = _StubUser(id=12345, first_name="Test", username="testuser")
+
+
 class TelethonClientWrapper:
     """Wrapper for Telethon client with helper methods."""
 
@@ -31,10 +58,12 @@ class TelethonClientWrapper:
             settings.telethon_session_path, settings.tg_api_id, settings.tg_api_hash
         )
         self.me: Optional[User] = None
+        # Read once; the mode is fixed for the lifetime of a client.
+        self._stub_mode = bool(settings.telethon_stub)
 
     async def start(self):
         """Start Telethon client and authenticate."""
-        if settings.telethon_stub:
+        if self._stub_mode:
             logger.info("Using Telethon stub mode")
             return
 
@@ -46,12 +75,12 @@ class TelethonClientWrapper:
 
     async def stop(self):
         """Stop Telethon client."""
-        if not settings.telethon_stub:
+        if not self._stub_mode:
             await self.client.disconnect()
 
     def is_connected(self) -> bool:
         """Return connection status for the underlying client."""
-        if settings.telethon_stub:
+        if self._stub_mode:
             return True
         return self.client.is_connected()
 
@@ -65,7 +94,7 @@ class TelethonClientWrapper:
         Returns:
             Dict mapping original name to resolved entity info
         """
-        if settings.telethon_stub:
+        if self._stub_mode:
             return self._stub_resolve_chats(chat_names)
 
         resolved = {}
@@ -120,7 +149,7 @@ class TelethonClientWrapper:
         Returns:
             List of chat names that can be used with resolve_chats()
         """
-        if settings.telethon_stub:
+        if self._stub_mode:
             return ["<Saved Messages>", "Test Chat 1", "Test Chat 2"]
 
         chat_names = []
@@ -183,7 +212,7 @@ class TelethonClientWrapper:
             since_date: Only fetch messages newer than this date
             reverse: If True, fetch from oldest to newest
         """
-        if settings.telethon_stub:
+        if self._stub_mode:
             async for msg in self._stub_get_messages(
                 entity, limit, since_date, min_message_id
             ):
@@ -230,7 +259,7 @@ class TelethonClientWrapper:
         self, entity: Any, message_id: int
     ) -> Optional[Message]:
         """Get a specific message by ID."""
-        if settings.telethon_stub:
+        if self._stub_mode:
             return self._stub_get_message_by_id(entity, message_id)
 
         try:
@@ -246,43 +275,38 @@ class TelethonClientWrapper:
         """Extract structured data from a Telethon message."""
         # Get text content
         text = message.text or ""
-        if (
-            message.media
-            and hasattr(message.media, "caption")
-            and message.media.caption
-        ):
-            text = message.media.caption
+        caption = getattr(message.media, "caption", None) if message.media else None
+        if caption:
+            text = caption
 
         # Get sender info
         sender_name, sender_username = format_sender_name(message.sender)
 
-        # Extract metadata
-        data = {
+        # Handle forwards
+        forward_from = None
+        forward = message.forward
+        if forward:
+            if forward.from_name:
+                forward_from = forward.from_name
+            elif forward.sender:
+                forward_from, _ = format_sender_name(forward.sender)
+
+        # Extract metadata; built in one literal so the dict is sized once
+        edit_date = message.edit_date
+        return {
             "message_id": message.id,
             "text": text,
             "sender": sender_name,
             "sender_username": sender_username,
             "message_date": int(message.date.timestamp()),
-            "edit_date": int(message.edit_date.timestamp())
-            if message.edit_date
-            else None,
+            "edit_date": int(edit_date.timestamp()) if edit_date else None,
             "chat_type": extract_chat_type(chat_entity),
             "reply_to_msg_id": message.reply_to_msg_id,
             "thread_id": getattr(message, "thread_id", None),
-            "forward_from": None,
+            "forward_from": forward_from,
+            "entity": chat_entity,
         }
 
-        # Handle forwards
-        if message.forward:
-            if message.forward.from_name:
-                data["forward_from"] = message.forward.from_name
-            elif message.forward.sender:
-                forward_name, _ = format_sender_name(message.forward.sender)
-                data["forward_from"] = forward_name
-
-        data["entity"] = chat_entity
-        return data
-
     def _stub_resolve_chats(self, chat_names: List[str]) -> Dict[str, Any]:
         """Stub implementation for testing."""
         resolved = {}
@@ -304,40 +328,23 @@ class TelethonClientWrapper:
         min_message_id: Optional[int],
     ) -> AsyncGenerator[Any, None]:
         """Stub implementation for testing."""
-        # Generate fake messages
+        # Generate fake messages; the sender and base date are shared
         count = min(limit or 10, 10)
+        now = datetime.now()
+        day = timedelta(days=1)
         for i in range(count):
-            message = type(
-                "Message",
-                (),
-                {
-                    "id": 1000 + i,
-                    "text": f"Test message {i} content",
-                    "sender": type(
-                        "User",
-                        (),
-                        {"first_name": "Test", "username": "testuser", "id": 12345},
-                    )(),
-                    "date": datetime.now() - timedelta(days=i),
-                    "edit_date": None,
-                    "reply_to_msg_id": None,
-                    "forward": None,
-                    "action": None,
-                    "media": None,
-                },
-            )()
-            yield message
+            yield _StubMessage(
+                id=1000 + i,
+                text=f"Test message {i} content",
+                date=now - i * day,
+                sender=_STUB_SENDER,
+            )
             await asyncio.sleep(0.01)
 
     def _stub_get_message_by_id(self, entity: Any, message_id: int) -> Optional[Any]:
         """Stub implementation for testing."""
-        return type(
-            "Message",
-            (),
-            {
-                "id": message_id,
-                "text": f"Reply context for message {message_id}",
-                "date": datetime.now(),
-                "edit_date": None,
-            },
-        )()
+        return _StubMessage(
+            id=message_id,
+            text=f"Reply context for message {message_id}",
+            date=datetime.now(),
+        )
@@ -1,19 +1,24 @@
 """Pytest configuration and fixtures for indexer tests."""
 
 import pytest
-import asyncio
+import importlib.util
 import tempfile
 import os
 from unittest.mock import MagicMock, AsyncMock
 from pathlib import Path
 
+# The asyncio event loop is session-scoped via pytest.ini
+# (asyncio_default_test_loop_scope / asyncio_default_fixture_loop_scope).
+
 
 @pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+def real_cliargs():
+    """Real CLIArgs class loaded once from settings.py, bypassing any global mocks."""
+    settings_path = os.path.join(os.path.dirname(__file__), "..", "settings.py")
+    spec = importlib.util.spec_from_file_location("real_settings", settings_path)
+    real_settings = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(real_settings)
+    return real_settings.CLIArgs
 
 
 @pytest.fixture
@@ -98,7 +103,7 @@ def sample_vespa_document():
         has_link=False,
         text="This is a test message for unit testing purposes.",
         bm25_text="This is a test message for unit testing purposes.",
-        vector={"values": [0.1, 0.2, 0.3]},
+        vector_small={"values": [0.1, 0.2, 0.3]},
     )
 
 
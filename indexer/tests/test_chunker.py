@@ -3,10 +3,6 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import sys
-from pathlib import Path
-
-# Add the indexer directory to path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Mock settings globally before any imports
 sys.modules["settings"] = MagicMock()
@@ -1,12 +1,8 @@
 """Tests for `db.DatabaseManager` using mocked connections (no real DB)."""
 
 import pytest
-import sys
-from pathlib import Path
 from unittest.mock import patch
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from db import DatabaseManager
 from models import EmbeddingCache, Chunk
 
@@ -125,7 +121,7 @@ async def test_chunk_upsert_and_query():
     )
 
     # fetch returns the chunk after insert
-    fake_conn._fetch_values = [{k: getattr(chunk, k) for k in chunk.model_fields}]
+    fake_conn._fetch_values = [chunk.model_dump()]
 
     with patch.object(dbm, "get_connection", return_value=DummyCtx(fake_conn)):
         await dbm.upsert_chunk(chunk)
@@ -2,13 +2,10 @@
 
 import pytest
 import asyncio
+import numpy as np
 from unittest.mock import AsyncMock, MagicMock, patch
-import sys
-from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from embedder import Embedder
+from embedder import Embedder, decode_cached_vector, encode_cached_vector
 from models import EmbeddingCache, IndexerMetrics
 from db import DatabaseManager
 
@@ -51,16 +48,15 @@ class TestEmbedder:
 
     def test_vector_serialization(self):
         """Test vector to bytes conversion."""
-        vector = [0.1, 0.2, -0.3, 0.4]
+        vector = np.asarray([0.1, 0.2, -0.3, 0.4], dtype=np.float32)
 
         # Convert to bytes and back
-        vector_bytes = self.embedder._vector_to_bytes(vector)
-        restored_vector = self.embedder._bytes_to_vector(vector_bytes)
+        vector_bytes = encode_cached_vector(vector)
+        restored_vector = decode_cached_vector(vector_bytes, len(vector))
 
-        # Should be approximately equal (float precision)
-        assert len(restored_vector) == len(vector)
-        for i in range(len(vector)):
-            assert abs(restored_vector[i] - vector[i]) < 1e-6
+        # Should be approximately equal (float16 precision)
+        assert len(vector_bytes) == len(vector) * 2
+        np.testing.assert_allclose(restored_vector, vector, atol=1e-3)
 
     @pytest.mark.asyncio
     async def test_embed_empty_texts(self):
@@ -85,7 +81,7 @@ class TestEmbedder:
                     text_hash=text_hash,
                     model=self.embedder.model,
                     dim=2,
-                    vector=self.embedder._vector_to_bytes(cached_vectors[0]),
+                    vector=np.asarray(cached_vectors[0], np.float32).tobytes(),
                     chunking_version=1,
                     preprocess_version=1,
                 )
@@ -94,7 +90,7 @@ class TestEmbedder:
                     text_hash=text_hash,
                     model=self.embedder.model,
                     dim=2,
-                    vector=self.embedder._vector_to_bytes(cached_vectors[1]),
+                    vector=np.asarray(cached_vectors[1], np.float32).tobytes(),
                     chunking_version=1,
                     preprocess_version=1,
                 )
@@ -107,6 +103,33 @@ class TestEmbedder:
         assert len(results) == 2
         assert self.embedder.metrics.embed_cached_hits == 2
         assert self.embedder.metrics.embed_cached_misses == 0
+        # Cached vectors are decoded into contiguous matrix rows
+        for text, expected in zip(texts, cached_vectors):
+            row = self.embedder._cache_row_of[hash_map[text]]
+            np.testing.assert_allclose(
+                self.embedder._cache_matrix[row], expected, atol=1e-6
+            )
+
+    @pytest.mark.asyncio
+    async def test_embed_texts_serves_repeats_from_memory(self):
+        """Test vectors already in the matrix skip the DB lookup."""
+        texts = ["Hello world"]
+        text_hash = self.embedder._compute_text_hash(texts[0])
+        self.mock_db.get_cached_embedding.return_value = EmbeddingCache(
+            text_hash=text_hash,
+            model=self.embedder.model,
+            dim=2,
+            vector=encode_cached_vector(np.asarray([0.5, -0.25], np.float32)),
+            chunking_version=1,
+            preprocess_version=1,
+        )
+
+        first = await self.embedder.embed_texts(texts)
+        second = await self.embedder.embed_texts(texts)
+
+        assert second == first == [(text_hash, [0.5, -0.25])]
+        self.mock_db.get_cached_embedding.assert_awaited_once_with(text_hash)
+        assert self.embedder.metrics.embed_cached_hits == 2
 
     @pytest.mark.asyncio
     async def test_embed_texts_no_cache(self):
@@ -161,6 +184,33 @@ class TestEmbedder:
         # Should have cached the new embeddings
         assert self.mock_db.cache_embedding.call_count == 2
 
+    @pytest.mark.asyncio
+    async def test_embed_texts_uses_precomputed_hashes(self):
+        """Test that caller-supplied hashes are used as cache keys."""
+        from embedder import compute_text_hash
+
+        texts = ["Hello world"]
+        hashes = [compute_text_hash(texts[0], self.embedder.model)]
+        assert hashes[0] == self.embedder._compute_text_hash(texts[0])
+
+        self.mock_db.get_cached_embedding.return_value = None
+        results = await self.embedder.embed_texts(
+            texts, dry_run=True, text_hashes=hashes
+        )
+
+        assert results == []
+        self.mock_db.get_cached_embedding.assert_awaited_once_with(hashes[0])
+
+    @pytest.mark.asyncio
+    async def test_embed_texts_rejects_mismatched_hashes(self):
+        """Test a hash list of the wrong length fails instead of dropping texts."""
+        texts = ["Hello world", "Test message"]
+        hashes = [self.embedder._compute_text_hash(texts[0])]
+
+        self.mock_db.get_cached_embedding.return_value = None
+        with pytest.raises(ValueError):
+            await self.embedder.embed_texts(texts, dry_run=True, text_hashes=hashes)
+
     @pytest.mark.asyncio
     async def test_embed_texts_dry_run(self):
         """Test embedding in dry run mode."""
@@ -325,6 +375,24 @@ class TestEmbedder:
         assert cached_call.model == self.embedder.model
         assert cached_call.chunking_version == 1
         assert cached_call.preprocess_version == 1
+        # Stored as float16: half the bytes of the float32 vector
+        assert len(cached_call.vector) == cached_call.dim * 2
+        np.testing.assert_allclose(
+            decode_cached_vector(cached_call.vector, cached_call.dim),
+            mock_vector,
+            atol=1e-3,
+        )
+
+    def test_decode_cached_vector_formats(self):
+        """Test float16 rows and legacy float32 rows both decode to float32."""
+        vector = np.asarray([0.1, -0.2, 0.3], dtype=np.float32)
+
+        fp16 = decode_cached_vector(encode_cached_vector(vector), 3)
+        fp32 = decode_cached_vector(vector.tobytes(), 3)
+
+        assert fp16.dtype == fp32.dtype == np.float32
+        np.testing.assert_allclose(fp16, vector, atol=1e-3)
+        assert np.array_equal(fp32, vector)
 
     def test_price_configuration(self):
         """Test that embedding prices are configured."""
@@ -361,7 +429,7 @@ class TestEmbedder:
                         text_hash=text_hash,
                         model=self.embedder.model,
                         dim=2,
-                        vector=self.embedder._vector_to_bytes([0.1, 0.2]),
+                        vector=np.asarray([0.1, 0.2], np.float32).tobytes(),
                         chunking_version=1,
                         preprocess_version=1,
                     )
@@ -381,6 +449,15 @@ class TestEmbedder:
         assert self.embedder.metrics.embed_cached_misses == 1
         # Should cache only the new embedding (second text)
         self.mock_db.cache_embedding.assert_called_once()
+        # Fresh vector is mirrored in the in-memory matrix; the 2-dim cached
+        # vector was dropped when the matrix was rebuilt for 3072 dims
+        new_hash = results[1][0]
+        row = self.embedder._cache_row_of[new_hash]
+        assert np.array_equal(
+            self.embedder._cache_matrix[row],
+            np.asarray(mock_vector, dtype=np.float32),
+        )
+        assert cached_hash not in self.embedder._cache_row_of
 
     @pytest.mark.parametrize(
         "model,expected_dim",
@@ -4,422 +4,271 @@ import pytest
 import asyncio
 from unittest.mock import MagicMock, AsyncMock, patch
 from datetime import datetime, timedelta
-import sys
-import os
-
-# Add the indexer directory to the path so imports work
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from types import MappingProxyType
 
 from main import TelegramIndexer
+from models import IndexerMetrics
 from settings import CLIArgs
 
 
-@pytest.fixture
-def mock_cli_args():
-    """Mock CLI args for testing."""
-    args = CLIArgs(
-        once=True,
-        chats=None,  # Test with no specific chats (all chats)
-        days=None,
-        dry_run=False,
-        limit_messages=10,  # Global limit across all chats
-        embed_batch_size=5,
-        embed_concurrency=2,
-        sleep_ms=0,
-        log_level="INFO",
-    )
-    return args
+_NOW = datetime.now().timestamp()
 
 
-@pytest.fixture
-def mock_indexer_deps():
-    """Mock all dependencies for TelegramIndexer."""
-    with patch("main.DatabaseManager") as mock_db_class, patch(
-        "main.TelethonClientWrapper"
-    ) as mock_tg_class, patch("main.TextChunker") as mock_chunker_class, patch(
-        "main.Embedder"
-    ) as mock_embedder_class, patch(
-        "main.VespaClient"
-    ) as mock_vespa_class:
-        # Mock database
-        mock_db = AsyncMock()
-        mock_db.initialize = AsyncMock()
-        mock_db.close = AsyncMock()
-        mock_db.get_existing_chunks = AsyncMock(return_value=[])
-        mock_db.upsert_chunk = AsyncMock()
-        mock_db_class.return_value = mock_db
-
-        # Mock Telethon client
-        mock_tg = AsyncMock()
-        mock_tg.start = AsyncMock()
-        mock_tg.stop = AsyncMock()
-        mock_tg.get_all_chats = AsyncMock(return_value=["Chat1", "Chat2", "Chat3"])
-        mock_tg.resolve_chats = AsyncMock(
-            return_value={
-                "Chat1": {
-                    "entity": "entity1",
-                    "id": "1",
-                    "title": "Chat 1",
-                    "type": "private",
-                },
-                "Chat2": {
-                    "entity": "entity2",
-                    "id": "2",
-                    "title": "Chat 2",
-                    "type": "group",
-                },
-                "Chat3": {
-                    "entity": "entity3",
-                    "id": "3",
-                    "title": "Chat 3",
-                    "type": "channel",
-                },
-            }
-        )
-        mock_tg.extract_message_data = MagicMock(
-            side_effect=lambda msg, entity: {
-                "message_id": msg.id,
-                "text": msg.text,
-                "sender": "Test User",
-                "sender_username": "testuser",
-                "message_date": int(msg.date.timestamp()),
-                "edit_date": None,
-                "chat_type": "private",
-                "reply_to_msg_id": None,
-                "thread_id": None,
-            }
-        )
-        mock_tg.client = MagicMock()
-        mock_tg.client.add_event_handler = MagicMock()
-        mock_tg.client.remove_event_handler = MagicMock()
-        mock_tg.is_connected = MagicMock(return_value=True)
-        mock_tg_class.return_value = mock_tg
-
-        # Mock chunker
-        mock_chunker = MagicMock()
-        mock_chunker.chunk_text = MagicMock(return_value=[("Test chunk", "test chunk")])
-        mock_chunker_class.return_value = mock_chunker
-
-        # Mock embedder
-        mock_embedder = AsyncMock()
-        mock_embedder.embed_texts = AsyncMock(
-            return_value=[("hash123", [0.1, 0.2, 0.3])]
-        )
-        mock_embedder.metrics = MagicMock()
-        mock_embedder.metrics.embed_calls = 0
-        mock_embedder.metrics.embed_cached_hits = 0
-        mock_embedder.metrics.embed_cached_misses = 0
-        mock_embedder.metrics.total_tokens = 100
-        mock_embedder.metrics.cost_estimate = 0.01
-        mock_embedder_class.return_value = mock_embedder
-
-        # Mock Vespa client
-        mock_vespa = AsyncMock()
-        mock_vespa.health_check = AsyncMock(return_value=True)
-        mock_vespa.feed_documents = AsyncMock(return_value=1)
-        mock_vespa.close = AsyncMock()
-        mock_vespa.metrics = MagicMock()
-        mock_vespa.metrics.vespa_feed_success = 0
-        mock_vespa.metrics.vespa_feed_retries = 0
-        mock_vespa.metrics.vespa_feed_failures = 0
-        mock_vespa_class.return_value = mock_vespa
-
-        yield {
-            "db": mock_db,
-            "tg": mock_tg,
-            "chunker": mock_chunker,
-            "embedder": mock_embedder,
-            "vespa": mock_vespa,
-        }
+class _EmbedTextsStub:
+    """Call-counting async stub for ``Embedder.embed_texts``."""
 
+    def __init__(self):
+        self.n = 0
 
-class TestTelegramIndexer:
-    """Test cases for TelegramIndexer."""
+    async def __call__(self, *args, **kwargs):
+        self.n += 1
+        return [("hash123", [0.1, 0.2, 0.3])]
 
-    @pytest.mark.asyncio
-    async def test_limit_messages_global_across_chats(
-        self, mock_cli_args, mock_indexer_deps
-    ):
-        """Test that limit_messages applies globally across all chats, not per chat."""
-        # Setup: Create messages for each chat
-        messages_per_chat = {
-            "Chat1": [
-                self._create_mock_message(i, f"Message {i} from Chat1")
-                for i in range(1, 6)
-            ],  # 5 messages
-            "Chat2": [
-                self._create_mock_message(i, f"Message {i} from Chat2")
-                for i in range(6, 11)
-            ],  # 5 messages
-            "Chat3": [
-                self._create_mock_message(i, f"Message {i} from Chat3")
-                for i in range(11, 16)
-            ],  # 5 messages
-        }
 
-        # Track actual messages processed
-        processed_messages = []
+class _FakeDate:
+    """Minimal stand-in for a message ``date`` (only ``timestamp()`` is used)."""
 
-        # Mock get_messages to return different messages for each chat
-        async def mock_get_messages(entity, limit=None, since_date=None):
-            if entity == "entity1":
-                messages = messages_per_chat["Chat1"]
-                chat_name = "Chat1"
-            elif entity == "entity2":
-                messages = messages_per_chat["Chat2"]
-                chat_name = "Chat2"
-            elif entity == "entity3":
-                messages = messages_per_chat["Chat3"]
-                chat_name = "Chat3"
-            else:
-                messages = []
-                chat_name = "Unknown"
-
-            # Apply limit if specified
-            if limit is not None:
-                messages = messages[:limit]
-
-            for msg in messages:
-                processed_messages.append(f"{chat_name}:{msg.id}")
-                yield msg
-
-        mock_indexer_deps["tg"].get_messages = mock_get_messages
-
-        # Mock process_message to track calls
-        original_process_message = AsyncMock()
+    __slots__ = ("_ts",)
 
-        # Set global limit to 7 messages
-        mock_cli_args.limit_messages = 7
-        mock_cli_args.days = 7  # Add missing days attribute
-        mock_cli_args.sleep_ms = 0  # Add missing sleep_ms attribute
-
-        indexer = TelegramIndexer(mock_cli_args)
-        indexer.db = mock_indexer_deps["db"]
-        indexer.tg_client = mock_indexer_deps["tg"]
-        indexer.chunker = mock_indexer_deps["chunker"]
-        indexer.embedder = mock_indexer_deps["embedder"]
-        indexer.vespa_client = mock_indexer_deps["vespa"]
+    def __init__(self, ts: float):
+        self._ts = ts
 
-        # Mock the process_message method to just count calls
-        async def mock_process_message(msg_data):
-            # Only process if message has text content
-            if msg_data.get("text", "").strip():
-                indexer.metrics.messages_indexed += 1
-                # Call embedder to simulate real processing
-                await mock_indexer_deps["embedder"].embed_texts(
-                    [msg_data["text"]], False
-                )
+    def timestamp(self) -> float:
+        return self._ts
 
-        indexer.process_message = mock_process_message
 
-        # Execute
-        await indexer.run_once()
+class _FakeMsg:
+    """Minimal stand-in for a Telethon message; cheaper than MagicMock."""
 
-        # Verify: Should process exactly 7 messages total
-        # (5 from Chat1 + 2 from Chat2, Chat3 should not be processed)
-        assert (
-            len(processed_messages) <= 7
-        ), f"Expected at most 7 messages processed, got {len(processed_messages)}: {processed_messages}"
-        assert (
-            indexer.metrics.messages_indexed <= 7
-        ), f"Expected at most 7 messages indexed, got {indexer.metrics.messages_indexed}"
+    __slots__ = ("id", "text", "date", "action", "media")
 
-    @pytest.mark.asyncio
-    async def test_no_limit_messages_processes_all(
-        self, mock_cli_args, mock_indexer_deps
-    ):
-        """Test that without limit_messages, all messages are processed."""
-        # Setup: Create messages for each chat
-        messages_per_chat = {
-            "Chat1": [
-                self._create_mock_message(i, f"Message {i} from Chat1")
-                for i in range(1, 4)
-            ],  # 3 messages
-            "Chat2": [
-                self._create_mock_message(i, f"Message {i} from Chat2")
-                for i in range(4, 7)
-            ],  # 3 messages
-            "Chat3": [
-                self._create_mock_message(i, f"Message {i} from Chat3")
-                for i in range(7, 10)
-            ],  # 3 messages
-        }
+    def __init__(self, message_id: int, text: str, ts: float):
+        self.id = message_id
+        self.text = text
+        self.date = _FakeDate(ts)
+        self.action = None  # Not a service message
+        self.media = None
 
-        async def mock_get_messages(entity, limit=None, since_date=None):
-            if entity == "entity1":
-                messages = messages_per_chat["Chat1"]
-            elif entity == "entity2":
-                messages = messages_per_chat["Chat2"]
-            elif entity == "entity3":
-                messages = messages_per_chat["Chat3"]
-            else:
-                messages = []
-
-            for msg in messages:
-                yield msg
 
-        mock_indexer_deps["tg"].get_messages = mock_get_messages
+_RESOLVED_3 = MappingProxyType(
+    {
+        "Chat1": {"entity": "entity1", "id": "1", "title": "Chat 1", "type": "private"},
+        "Chat2": {"entity": "entity2", "id": "2", "title": "Chat 2", "type": "group"},
+        "Chat3": {"entity": "entity3", "id": "3", "title": "Chat 3", "type": "channel"},
+    }
+)
+_RESOLVED_2 = MappingProxyType({k: _RESOLVED_3[k] for k in ("Chat1", "Chat2")})
 
-        # Remove limit
-        mock_cli_args.limit_messages = None
-        mock_cli_args.days = 7  # Add missing days attribute
-        mock_cli_args.sleep_ms = 0  # Add missing sleep_ms attribute
+# Five messages per chat, keyed by the entity returned from resolve_chats
+_MSGS = {
+    f"entity{c}": [
+        _FakeMsg(i, f"Message {i} from Chat{c}", _NOW)
+        for i in range((c - 1) * 5 + 1, c * 5 + 1)
+    ]
+    for c in (1, 2, 3)
+}
 
-        indexer = TelegramIndexer(mock_cli_args)
-        indexer.db = mock_indexer_deps["db"]
-        indexer.tg_client = mock_indexer_deps["tg"]
-        indexer.chunker = mock_indexer_deps["chunker"]
-        indexer.embedder = mock_indexer_deps["embedder"]
-        indexer.vespa_client = mock_indexer_deps["vespa"]
 
-        # Mock the process_message method to just count calls
-        async def mock_process_message(msg_data):
-            if msg_data.get("text", "").strip():
-                indexer.metrics.messages_indexed += 1
-                await mock_indexer_deps["embedder"].embed_texts(
-                    [msg_data["text"]], False
-                )
+async def _get_msgs(entity, limit=None, since_date=None):
+    """Stand-in for ``TelethonClientWrapper.get_messages`` over ``_MSGS``."""
+    msgs = _MSGS.get(entity, [])
+    if limit is not None:
+        msgs = msgs[:limit]
+    for msg in msgs:
+        yield msg
 
-        indexer.process_message = mock_process_message
 
-        # Execute
-        await indexer.run_once()
+@pytest.fixture
+def mock_cli_args():
+    """Mock CLI args for testing."""
+    args = CLIArgs(
+        once=True,
+        chats=None,  # Test with no specific chats (all chats)
+        days=None,
+        dry_run=False,
+        limit_messages=10,  # Global limit across all chats
+        embed_batch_size=5,
+        embed_concurrency=2,
+        sleep_ms=0,
+        log_level="INFO",
+    )
+    return args
 
-        # Verify: Should process all 9 messages
-        assert (
-            indexer.metrics.messages_indexed == 9
-        ), f"Expected 9 messages indexed, got {indexer.metrics.messages_indexed}"
 
-    @pytest.mark.asyncio
-    async def test_limit_messages_stops_at_exact_limit(
-        self, mock_cli_args, mock_indexer_deps
+@pytest.fixture(scope="module")
+def _module_indexer_deps(request):
+    """Patch TelegramIndexer dependencies once per module."""
+    patched = {}
+    for name in (
+        "DatabaseManager",
+        "TelethonClientWrapper",
+        "TextChunker",
+        "Embedder",
+        "VespaClient",
     ):
-        """Test that processing stops when exactly reaching the message limit."""
-        # Setup: Create exactly enough messages to test boundary
-        messages_per_chat = {
-            "Chat1": [
-                self._create_mock_message(i, f"Message {i} from Chat1")
-                for i in range(1, 6)
-            ],  # 5 messages
-            "Chat2": [
-                self._create_mock_message(i, f"Message {i} from Chat2")
-                for i in range(6, 11)
-            ],  # 5 messages
+        patcher = patch(f"main.{name}")
+        patched[name] = patcher.start()
+        request.addfinalizer(patcher.stop)
+    mock_db_class = patched["DatabaseManager"]
+    mock_tg_class = patched["TelethonClientWrapper"]
+    mock_chunker_class = patched["TextChunker"]
+    mock_embedder_class = patched["Embedder"]
+    mock_vespa_class = patched["VespaClient"]
+
+    # Mock database
+    mock_db = AsyncMock()
+    mock_db.initialize = AsyncMock()
+    mock_db.close = AsyncMock()
+    mock_db.get_existing_chunks = AsyncMock(return_value=[])
+    mock_db.upsert_chunk = AsyncMock()
+    mock_db_class.return_value = mock_db
+
+    # Mock Telethon client
+    mock_tg = AsyncMock()
+    mock_tg.start = AsyncMock()
+    mock_tg.stop = AsyncMock()
+    mock_tg.get_all_chats = AsyncMock(return_value=["Chat1", "Chat2", "Chat3"])
+    mock_tg.resolve_chats = AsyncMock(return_value=_RESOLVED_3)
+    mock_tg.extract_message_data = MagicMock(
+        side_effect=lambda msg, entity: {
+            "message_id": msg.id,
+            "text": msg.text,
+            "sender": "Test User",
+            "sender_username": "testuser",
+            "message_date": int(msg.date.timestamp()),
+            "edit_date": None,
+            "chat_type": "private",
+            "reply_to_msg_id": None,
+            "thread_id": None,
         }
+    )
+    mock_tg.client = MagicMock()
+    mock_tg.client.add_event_handler = MagicMock()
+    mock_tg.client.remove_event_handler = MagicMock()
+    mock_tg.is_connected = MagicMock(return_value=True)
+    mock_tg_class.return_value = mock_tg
+
+    # Mock chunker
+    mock_chunker = MagicMock()
+    mock_chunker.chunk_text = MagicMock(return_value=[("Test chunk", "test chunk")])
+    mock_chunker_class.return_value = mock_chunker
+
+    # Mock embedder
+    mock_embedder = AsyncMock()
+    mock_embedder.embed_texts = _EmbedTextsStub()
+    mock_embedder.metrics = MagicMock()
+    mock_embedder.metrics.embed_calls = 0
+    mock_embedder.metrics.embed_cached_hits = 0
+    mock_embedder.metrics.embed_cached_misses = 0
+    mock_embedder.metrics.total_tokens = 100
+    mock_embedder.metrics.cost_estimate = 0.01
+    mock_embedder_class.return_value = mock_embedder
+
+    # Mock Vespa client
+    mock_vespa = AsyncMock()
+    mock_vespa.health_check = AsyncMock(return_value=True)
+    mock_vespa.feed_documents = AsyncMock(return_value=1)
+    mock_vespa.close = AsyncMock()
+    mock_vespa.metrics = MagicMock()
+    mock_vespa.metrics.vespa_feed_success = 0
+    mock_vespa.metrics.vespa_feed_retries = 0
+    mock_vespa.metrics.vespa_feed_failures = 0
+    mock_vespa_class.return_value = mock_vespa
+
+    deps = {
+        "db": mock_db,
+        "tg": mock_tg,
+        "chunker": mock_chunker,
+        "embedder": mock_embedder,
+        "vespa": mock_vespa,
+    }
+    # Attributes that individual tests replace; restored before each test
+    defaults = {
+        "get_all_chats": mock_tg.get_all_chats,
+    }
+    return deps, defaults
 
-        async def mock_get_messages(entity, limit=None, since_date=None):
-            if entity == "entity1":
-                messages = messages_per_chat["Chat1"]
-            elif entity == "entity2":
-                messages = messages_per_chat["Chat2"]
-            else:
-                messages = []
-
-            # Apply limit if specified
-            if limit is not None:
-                messages = messages[:limit]
-
-            for msg in messages:
-                yield msg
-
-        mock_indexer_deps["tg"].get_messages = mock_get_messages
-
-        # Set limit to exactly match first chat
-        mock_cli_args.limit_messages = 5
-        mock_cli_args.days = 7  # Add missing days attribute
-        mock_cli_args.sleep_ms = 0  # Add missing sleep_ms attribute
 
-        indexer = TelegramIndexer(mock_cli_args)
-        indexer.db = mock_indexer_deps["db"]
-        indexer.tg_client = mock_indexer_deps["tg"]
-        indexer.chunker = mock_indexer_deps["chunker"]
-        indexer.embedder = mock_indexer_deps["embedder"]
-        indexer.vespa_client = mock_indexer_deps["vespa"]
+@pytest.fixture
+def mock_indexer_deps(_module_indexer_deps):
+    """Mock all dependencies for TelegramIndexer, reset for each test."""
+    deps, defaults = _module_indexer_deps
+    for name, value in defaults.items():
+        setattr(deps["tg"], name, value)
+    for mock in deps.values():
+        mock.reset_mock()
+    deps["tg"].resolve_chats.return_value = _RESOLVED_3
+    deps["embedder"].embed_texts = _EmbedTextsStub()
+    return deps
+
+
+@pytest.fixture(scope="class")
+def indexer(_module_indexer_deps):
+    """One TelegramIndexer wired to the mocked dependencies, shared per class."""
+    deps, _ = _module_indexer_deps
+    args = CLIArgs(
+        once=True,
+        chats=None,
+        days=7,
+        dry_run=False,
+        limit_messages=None,
+        embed_batch_size=5,
+        embed_concurrency=2,
+        sleep_ms=0,
+        log_level="INFO",
+    )
+    # CLIArgs is a MagicMock when another module mocked ``settings`` globally
+    args.days = 7
+    args.sleep_ms = 0
+    idx = TelegramIndexer(args)
+    idx.db = deps["db"]
+    idx.tg_client = deps["tg"]
+    idx.chunker = deps["chunker"]
+    idx.embedder = deps["embedder"]
+    idx.vespa_client = deps["vespa"]
+    return idx
 
-        # Execute
-        await indexer.run_once()
 
-        # Verify: Should process exactly 5 messages (all from Chat1, none from Chat2)
-        embed_calls = len(mock_indexer_deps["embedder"].embed_texts.call_args_list)
-        assert (
-            embed_calls == 5
-        ), f"Expected exactly 5 embedding calls, got {embed_calls}"
+class TestTelegramIndexer:
+    """Test cases for TelegramIndexer."""
 
+    @pytest.mark.parametrize(
+        "limit,chats,expected",
+        [
+            pytest.param(7, None, 7, id="global-limit-across-chats"),
+            pytest.param(None, None, 15, id="no-limit-processes-all"),
+            pytest.param(5, None, 5, id="stops-at-exact-limit"),
+            pytest.param(3, "Chat1,Chat2", 3, id="specific-chats-with-limit"),
+        ],
+    )
     @pytest.mark.asyncio
-    async def test_specific_chats_with_limit(self, mock_cli_args, mock_indexer_deps):
-        """Test that limit works correctly when specific chats are provided."""
-        # Setup specific chats
-        mock_cli_args.chats = "Chat1,Chat2"
-        mock_cli_args.limit_messages = 3
-        mock_cli_args.days = 7  # Add missing days attribute
-        mock_cli_args.sleep_ms = 0  # Add missing sleep_ms attribute
-
-        # Mock resolve_chats for specific chats only
-        mock_indexer_deps["tg"].resolve_chats = AsyncMock(
-            return_value={
-                "Chat1": {
-                    "entity": "entity1",
-                    "id": "1",
-                    "title": "Chat 1",
-                    "type": "private",
-                },
-                "Chat2": {
-                    "entity": "entity2",
-                    "id": "2",
-                    "title": "Chat 2",
-                    "type": "group",
-                },
-            }
-        )
-
-        # Don't call get_all_chats since specific chats are provided
-        mock_indexer_deps["tg"].get_all_chats = AsyncMock()
-
-        messages_per_chat = {
-            "Chat1": [
-                self._create_mock_message(i, f"Message {i} from Chat1")
-                for i in range(1, 6)
-            ],  # 5 messages
-            "Chat2": [
-                self._create_mock_message(i, f"Message {i} from Chat2")
-                for i in range(6, 11)
-            ],  # 5 messages
-        }
-
-        async def mock_get_messages(entity, limit=None, since_date=None):
-            if entity == "entity1":
-                messages = messages_per_chat["Chat1"]
-            elif entity == "entity2":
-                messages = messages_per_chat["Chat2"]
-            else:
-                messages = []
-
-            if limit is not None:
-                messages = messages[:limit]
-
-            for msg in messages:
-                yield msg
+    async def test_limit_messages(
+        self, indexer, mock_indexer_deps, limit, chats, expected
+    ):
+        """Test that limit_messages applies globally across all chats, not per chat."""
+        mock_indexer_deps["tg"].get_messages = _get_msgs
 
-        mock_indexer_deps["tg"].get_messages = mock_get_messages
+        indexer.args.limit_messages = limit
+        indexer.args.chats = chats
+        indexer.metrics = IndexerMetrics()
 
-        indexer = TelegramIndexer(mock_cli_args)
-        indexer.db = mock_indexer_deps["db"]
-        indexer.tg_client = mock_indexer_deps["tg"]
-        indexer.chunker = mock_indexer_deps["chunker"]
-        indexer.embedder = mock_indexer_deps["embedder"]
-        indexer.vespa_client = mock_indexer_deps["vespa"]
+        if chats:
+            # Resolve only the requested chats
+            mock_indexer_deps["tg"].resolve_chats.return_value = _RESOLVED_2
+            # Don't call get_all_chats since specific chats are provided
+            mock_indexer_deps["tg"].get_all_chats = AsyncMock()
 
         # Execute
         await indexer.run_once()
 
-        # Verify: Should process exactly 3 messages total across specified chats
-        embed_calls = len(mock_indexer_deps["embedder"].embed_texts.call_args_list)
+        # Verify: one embedding call per processed message, capped by the limit
+        embed_calls = mock_indexer_deps["embedder"].embed_texts.n
         assert (
-            embed_calls == 3
-        ), f"Expected exactly 3 embedding calls, got {embed_calls}"
+            embed_calls == expected
+        ), f"Expected exactly {expected} embedding calls, got {embed_calls}"
 
-        # Verify get_all_chats was not called since specific chats were provided
-        mock_indexer_deps["tg"].get_all_chats.assert_not_called()
+        if chats:
+            mock_indexer_deps["tg"].get_all_chats.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_full_history_when_days_none(self, mock_cli_args, mock_indexer_deps):
@@ -457,15 +306,8 @@ class TestTelegramIndexer:
         ), "Expected since_date to be None for full history"
 
     def _create_mock_message(self, message_id: int, text: str):
-        """Helper to create mock message objects."""
-        message = MagicMock()
-        message.id = message_id
-        message.text = text
-        message.date = MagicMock()
-        message.date.timestamp.return_value = datetime.now().timestamp()
-        message.action = None  # Not a service message
-        message.media = None
-        return message
+        """Helper to create lightweight message objects."""
+        return _FakeMsg(message_id, text, _NOW)
 
 
 def test_simple_cliargs_with_explicit_days():
@@ -513,23 +355,11 @@ def test_simple_cliargs_with_explicit_days():
 @patch("main.VespaClient")
 @patch("main.CostEstimator")
 def test_global_message_limit_calculation(
-    mock_cost, mock_vespa, mock_embedder, mock_chunker, mock_db, mock_tg
+    mock_cost, mock_vespa, mock_embedder, mock_chunker, mock_db, mock_tg, real_cliargs
 ):
     """Test the global message limit calculation logic."""
-    # Import CLIArgs directly from file to bypass any global mocks
-    import sys
-    import importlib.util
-    import os
-
-    # Get the real settings module by importing it directly from file
-    settings_path = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)), "settings.py"
-    )
-    spec = importlib.util.spec_from_file_location("real_settings", settings_path)
-    real_settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(real_settings)
-
-    CLIArgs = real_settings.CLIArgs
+    # Real CLIArgs loaded from file to bypass any global mocks
+    CLIArgs = real_cliargs
 
     from main import TelegramIndexer
 
@@ -575,23 +405,11 @@ def test_global_message_limit_calculation(
 @patch("main.VespaClient")
 @patch("main.CostEstimator")
 def test_no_message_limit(
-    mock_cost, mock_vespa, mock_embedder, mock_chunker, mock_db, mock_tg
+    mock_cost, mock_vespa, mock_embedder, mock_chunker, mock_db, mock_tg, real_cliargs
 ):
     """Test processing without message limit."""
-    # Import CLIArgs directly from file to bypass any global mocks
-    import sys
-    import importlib.util
-    import os
-
-    # Get the real settings module by importing it directly from file
-    settings_path = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)), "settings.py"
-    )
-    spec = importlib.util.spec_from_file_location("real_settings", settings_path)
-    real_settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(real_settings)
-
-    CLIArgs = real_settings.CLIArgs
+    # Real CLIArgs loaded from file to bypass any global mocks
+    CLIArgs = real_cliargs
 
     from main import TelegramIndexer
 
@@ -623,22 +441,10 @@ def test_no_message_limit(
     assert remaining_limit is None, "Should have no limit when limit_messages is None"
 
 
-def test_cliargs_default_days():
+def test_cliargs_default_days(real_cliargs):
     """Verify CLIArgs defaults to full history when days omitted."""
-    # Import CLIArgs directly from file to bypass any global mocks
-    import sys
-    import importlib.util
-    import os
-
-    # Get the real settings module by importing it directly from file
-    settings_path = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)), "settings.py"
-    )
-    spec = importlib.util.spec_from_file_location("real_settings", settings_path)
-    real_settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(real_settings)
-
-    CLIArgs = real_settings.CLIArgs
+    # Real CLIArgs loaded from file to bypass any global mocks
+    CLIArgs = real_cliargs
     args = CLIArgs(
         once=True,
         chats="Chat1,Chat2",
@@ -674,25 +480,9 @@ def test_cliargs_default_days():
 class TestCLIArgs:
     """Test cases for CLIArgs functionality."""
 
-    def _get_real_cliargs(self):
-        """Helper to get the real CLIArgs class, bypassing any global mocks."""
-        import sys
-        import importlib.util
-        import os
-
-        # Get the real settings module by importing it directly from file
-        settings_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), "settings.py"
-        )
-        spec = importlib.util.spec_from_file_location("real_settings", settings_path)
-        real_settings = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(real_settings)
-
-        return real_settings.CLIArgs
-
-    def test_get_chat_list_with_chats(self):
+    def test_get_chat_list_with_chats(self, real_cliargs):
         """Test get_chat_list when chats are specified."""
-        CLIArgs = self._get_real_cliargs()
+        CLIArgs = real_cliargs
         args = CLIArgs(
             once=True,
             chats="Chat1,Chat2,Chat3",
@@ -708,9 +498,9 @@ class TestCLIArgs:
         chat_list = args.get_chat_list()
         assert chat_list == ["Chat1", "Chat2", "Chat3"]
 
-    def test_get_chat_list_without_chats(self):
+    def test_get_chat_list_without_chats(self, real_cliargs):
         """Test get_chat_list when no chats are specified."""
-        CLIArgs = self._get_real_cliargs()
+        CLIArgs = real_cliargs
         args = CLIArgs(
             once=True,
             chats=None,
@@ -726,9 +516,9 @@ class TestCLIArgs:
         chat_list = args.get_chat_list()
         assert chat_list == []
 
-    def test_get_chat_list_with_empty_chats(self):
+    def test_get_chat_list_with_empty_chats(self, real_cliargs):
         """Test get_chat_list with empty chats string."""
-        CLIArgs = self._get_real_cliargs()
+        CLIArgs = real_cliargs
         args = CLIArgs(
             once=True,
             chats="",
@@ -744,9 +534,9 @@ class TestCLIArgs:
         chat_list = args.get_chat_list()
         assert chat_list == []
 
-    def test_get_chat_list_with_whitespace_chats(self):
+    def test_get_chat_list_with_whitespace_chats(self, real_cliargs):
         """Test get_chat_list with chats containing whitespace."""
-        CLIArgs = self._get_real_cliargs()
+        CLIArgs = real_cliargs
         args = CLIArgs(
             once=True,
             chats=" Chat1 , Chat2 , Chat3 ",
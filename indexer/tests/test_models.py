@@ -1,11 +1,21 @@
 """Tests for data models."""
 
-import sys
+import re
 from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import pytest
 
-from models import EmbeddingCache, Chunk, VespaDocument, IndexerMetrics
+from models import (
+    EmbeddingCache,
+    Chunk,
+    VespaDocument,
+    IndexerMetrics,
+    VespaFields,
+)
+
+MESSAGE_SCHEMA = (
+    Path(__file__).resolve().parents[2] / "vespa/application/schemas/message.sd"
+)
 
 
 class TestEmbeddingCache:
@@ -45,6 +55,20 @@ class TestEmbeddingCache:
 
         assert cache.lang == "en"
 
+    def test_cache_is_frozen(self):
+        """Test cache entry is immutable."""
+        cache = EmbeddingCache(
+            text_hash="abc123",
+            model="m",
+            dim=2,
+            vector=b"",
+            chunking_version=1,
+            preprocess_version=1,
+        )
+
+        with pytest.raises(AttributeError):
+            cache.dim = 3
+
 
 class TestChunk:
     """Test Chunk model."""
@@ -95,6 +119,21 @@ class TestChunk:
         assert chunk.thread_id == 789
         assert chunk.has_link is True
 
+    def test_chunk_is_slotted_and_frozen(self):
+        """Test chunk has no instance dict and rejects mutation."""
+        chunk = Chunk(
+            chunk_id="chat123:msg456:0",
+            chat_id="123",
+            message_id=456,
+            chunk_idx=0,
+            text_hash="abc123",
+            message_date=1692825600,
+        )
+
+        assert not hasattr(chunk, "__dict__")
+        with pytest.raises(AttributeError):
+            chunk.chunk_idx = 1
+
 
 class TestVespaDocument:
     """Test VespaDocument model."""
@@ -150,6 +189,57 @@ class TestVespaDocument:
         assert doc.thread_id == 789
         assert doc.has_link is True
 
+    @pytest.mark.skipif(
+        not MESSAGE_SCHEMA.exists(), reason="Vespa schema not checked out"
+    )
+    def test_feed_fields_match_schema(self):
+        """Test the put payload fields match the Vespa schema (guards field drift)."""
+        schema_fields = set(
+            re.findall(r"^\s*field\s+(\w+)\s+type\b", MESSAGE_SCHEMA.read_text(), re.M)
+        )
+
+        assert set(VespaFields.__struct_fields__) == schema_fields
+
+    def test_vector_payload_is_not_copied(self):
+        """Test the vector payload is stored by reference, not copied."""
+        vector = {"values": [0.1, 0.2, 0.3]}
+        doc = VespaDocument(
+            id="doc123",
+            chat_id="123",
+            message_id=456,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Hello world",
+            bm25_text="Hello world",
+            vector_large=vector,
+        )
+
+        assert doc.vector_large is vector
+
+    def test_to_vespa_fields(self):
+        """Test mapping to Vespa's field payload."""
+        doc = VespaDocument(
+            id="chat123:msg456:0",
+            chat_id="123",
+            message_id=456,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+            sender="TestUser",
+            vector_small={"values": [0.1, 0.2]},
+        )
+
+        fields = doc.to_vespa_fields()
+
+        assert fields.id == doc.id
+        assert fields.sender == "TestUser"
+        assert fields.sender_username == ""
+        assert fields.chat_type == ""
+        assert fields.date == doc.message_date
+        assert fields.vector_small == {"values": "3DCCCCCD3E4CCCCD"}
+        assert fields.vector_large is None
+
 
 class TestIndexerMetrics:
     """Test IndexerMetrics model."""
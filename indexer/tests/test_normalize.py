@@ -3,10 +3,6 @@
 import pytest
 from datetime import datetime
 from unittest.mock import MagicMock
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from normalize import (
     normalize_text,
@@ -66,6 +62,11 @@ class TestNormalizeText:
         assert has_link is True
         assert "HTTP://EXAMPLE.COM" in bm25_text
 
+    def test_normalize_text_non_http_scheme_is_not_link(self):
+        """Test that '://' alone (e.g. ftp) does not count as a link."""
+        _, _, has_link = normalize_text("Mirror at ftp://files.example.com")
+        assert has_link is False
+
     def test_normalize_whitespace_cleanup(self):
         """Test whitespace normalization."""
         input_text = "Text   with    multiple     spaces\n\nand  newlines"
@@ -74,6 +75,17 @@ class TestNormalizeText:
         assert "  " not in bm25_text
         assert has_link is False
 
+    def test_normalize_shares_display_and_bm25_text(self):
+        """Test the display and BM25 texts are one string, not two copies."""
+        text, bm25_text, _ = normalize_text("Some   spaced  text")
+        assert text is bm25_text
+
+    def test_normalize_unicode_whitespace(self):
+        """Test that tabs and non-breaking spaces collapse like spaces."""
+        text, bm25_text, _ = normalize_text("\t Hello\u00a0\u2003world \r\n")
+        assert text == "Hello world"
+        assert bm25_text == "Hello world"
+
     def test_normalize_text_with_link_and_whitespace(self):
         """Test normalization with both links and whitespace issues."""
         input_text = "Check   http://example.com   for    info"
@@ -173,6 +185,11 @@ class TestComposeMessageWithReply:
         assert "Word1" in result
         assert "Main message" in result
 
+    def test_compose_reply_without_spaces_is_hard_cut(self):
+        """Test a reply with no word boundary is cut at the character budget."""
+        result = compose_message_with_reply("Main", "x" * 100, max_reply_tokens=5)
+        assert result.startswith("x" * 20 + "...\n")
+
     def test_compose_empty_reply(self):
         """Test composing with empty reply."""
         result = compose_message_with_reply("Main message", "")
@@ -312,3 +329,24 @@ class TestFormatSenderName:
         full_name, username = format_sender_name(sender)
         assert full_name is None
         assert username is None
+
+    def test_username_is_interned(self):
+        """Test repeated usernames resolve to one shared string."""
+        first, second = MagicMock(), MagicMock()
+        first.username = "".join(["john", "doe"])
+        second.username = "".join(["john", "doe"])
+        assert first.username is not second.username
+
+        _, username_a = format_sender_name(first)
+        _, username_b = format_sender_name(second)
+        assert username_a is username_b
+
+    def test_repeat_sender_hits_cache(self):
+        """Test senders with the same fields share one cached result."""
+        first, second = MagicMock(), MagicMock()
+        for sender in (first, second):
+            sender.first_name = "Jane"
+            sender.last_name = "Roe"
+            sender.username = "janeroe"
+
+        assert format_sender_name(first) is format_sender_name(second)
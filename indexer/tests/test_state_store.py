@@ -1,5 +1,6 @@
 """Tests for backfill state persistence."""
 
+import asyncio
 import json
 from pathlib import Path
 
@@ -36,3 +37,144 @@ async def test_backfill_state_store_ignores_regressions(tmp_path):
     # Verify file contents were not regressed
     payload = json.loads(Path(state_path).read_text())
     assert payload["chats"]["chat-1"]["last_message_id"] == 100
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_lenient_load(tmp_path):
+    state_path = tmp_path / "backfill_state.json"
+    state_path.write_text(
+        json.dumps({"chats": {"chat-1": {"last_message_id": "7"}}, "extra": True})
+    )
+
+    store = BackfillStateStore(str(state_path))
+    assert await store.get_last_message_id("chat-1") == 7
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_appends_and_compacts(tmp_path):
+    state_path = tmp_path / "backfill_state.json"
+    store = BackfillStateStore(str(state_path))
+
+    await store.update_chat("chat-1", 10)  # first write creates the snapshot
+    await store.update_chat("chat-1", 20)
+    await store.update_chat("chat-2", 5)
+    await store.flush()
+
+    # Later updates only land in the log, but a reload replays them
+    payload = json.loads(state_path.read_text())
+    assert payload["chats"]["chat-1"]["last_message_id"] == 10
+    assert store.log_path.exists()
+
+    store_reloaded = BackfillStateStore(str(state_path))
+    assert await store_reloaded.get_last_message_id("chat-1") == 20
+    assert await store_reloaded.get_last_message_id("chat-2") == 5
+
+    await store.close()
+    assert not store.log_path.exists()
+    payload = json.loads(state_path.read_text())
+    assert payload["chats"]["chat-1"]["last_message_id"] == 20
+    assert payload["chats"]["chat-2"]["last_message_id"] == 5
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_skips_torn_log_line(tmp_path):
+    state_path = tmp_path / "backfill_state.json"
+    store = BackfillStateStore(str(state_path))
+    store.log_path.write_bytes(b'{"c":"chat-1","m":3}\n{"c":"chat-1","m":')
+
+    assert await store.get_last_message_id("chat-1") == 3
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_coalesces_updates(tmp_path):
+    state_path = tmp_path / "backfill_state.json"
+    store = BackfillStateStore(str(state_path))
+    await store.update_chat("chat-1", 1)
+
+    for message_id in range(2, 50):
+        await store.update_chat("chat-1", message_id)
+
+    # Served from memory before anything is flushed
+    assert await store.get_last_message_id("chat-1") == 49
+    assert not store.log_path.exists()
+
+    await store.flush()
+    assert store.log_path.read_bytes().count(b"\n") == 1
+
+    await store.close()
+    payload = json.loads(state_path.read_text())
+    assert payload["chats"]["chat-1"]["last_message_id"] == 49
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_flushes_in_background(tmp_path, monkeypatch):
+    monkeypatch.setattr("state.FLUSH_INTERVAL_S", 0)
+    state_path = tmp_path / "backfill_state.json"
+    store = BackfillStateStore(str(state_path))
+
+    await store.update_chat("chat-1", 1)
+    await store.update_chat("chat-1", 2)
+    await store._flush_task
+
+    store_reloaded = BackfillStateStore(str(state_path))
+    assert await store_reloaded.get_last_message_id("chat-1") == 2
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_keeps_progress_after_failed_flush(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr("state.FLUSH_INTERVAL_S", 0)
+    monkeypatch.setattr("state.FLUSH_RETRY_S", 0)
+    state_path = tmp_path / "backfill_state.json"
+    store = BackfillStateStore(str(state_path))
+    append = store._append
+    failures = []
+
+    async def append_once_failing(records):
+        if not failures:
+            failures.append(records)
+            raise OSError(28, "No space left on device")
+        await append(records)
+
+    monkeypatch.setattr(store, "_append", append_once_failing)
+
+    await store.update_chat("chat-1", 1)
+    await store.update_chat("chat-1", 5)
+    await store._flush_task  # the failure is logged and the flush retried
+    assert failures
+    assert not store._dirty
+
+    await store.close()
+    payload = json.loads(state_path.read_text())
+    assert payload["chats"]["chat-1"]["last_message_id"] == 5
+
+
+@pytest.mark.asyncio
+async def test_backfill_state_store_flushes_updates_made_during_a_flush(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr("state.FLUSH_INTERVAL_S", 0)
+    state_path = tmp_path / "backfill_state.json"
+    store = BackfillStateStore(str(state_path))
+    append = store._append
+    writing = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_append(records):
+        writing.set()
+        await release.wait()
+        await append(records)
+
+    monkeypatch.setattr(store, "_append", slow_append)
+
+    await store.update_chat("chat-1", 1)
+    await store.update_chat("chat-1", 2)
+    await writing.wait()
+    await store.update_chat("chat-1", 3)  # lands while 2 is being written
+    release.set()
+    await store._flush_task
+
+    store_reloaded = BackfillStateStore(str(state_path))
+    assert await store_reloaded.get_last_message_id("chat-1") == 3
+    await store.close()
@@ -1,13 +1,9 @@
 """Tests for TelethonClientWrapper (stub mode only)."""
 
 import pytest
-import sys
-from pathlib import Path
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from telethon_client import TelethonClientWrapper
 from normalize import extract_chat_type
 from settings import settings as real_settings
@@ -44,6 +40,37 @@ async def test_stub_get_messages_limit():
     assert all("Test message" in m.text for m in msgs)
 
 
+@pytest.mark.asyncio
+async def test_stub_messages_extract_cleanly():
+    original = real_settings.telethon_stub
+    real_settings.telethon_stub = True
+    try:
+        with patch("telethon_client.TelegramClient"):
+            wrapper = TelethonClientWrapper()
+        chat_entity = type("Chat", (), {"megagroup": True})()
+        async for m in wrapper.get_messages("stub_entity", limit=1):
+            data = wrapper.extract_message_data(m, chat_entity)
+    finally:
+        real_settings.telethon_stub = original
+    assert data["message_id"] == 1000
+    assert data["sender"] == "Test"
+    assert data["sender_username"] == "testuser"
+    assert data["thread_id"] is None
+
+
+def test_stub_mode_is_fixed_at_construction():
+    original = real_settings.telethon_stub
+    real_settings.telethon_stub = True
+    try:
+        with patch("telethon_client.TelegramClient") as mock_client:
+            wrapper = TelethonClientWrapper()
+        real_settings.telethon_stub = False
+        assert wrapper.is_connected() is True
+        mock_client.return_value.is_connected.assert_not_called()
+    finally:
+        real_settings.telethon_stub = original
+
+
 def _make_message(**kwargs):
     defaults = {
         "id": 1,
@@ -101,6 +128,18 @@ def test_extract_message_data_forward():
     assert data["chat_type"] in {"group", "channel", "private", "unknown"}
 
 
+def test_extract_message_data_prefers_media_caption():
+    with patch("telethon_client.TelegramClient"):
+        wrapper = TelethonClientWrapper()
+    media = type("Media", (), {"caption": "Photo caption"})()
+    msg = _make_message(text="", media=media)
+    chat_entity = type("Chat", (), {"megagroup": False, "channel": True})()
+    data = wrapper.extract_message_data(msg, chat_entity)
+    assert data["text"] == "Photo caption"
+    assert data["forward_from"] is None
+    assert data["entity"] is chat_entity
+
+
 @pytest.mark.asyncio
 async def test_get_message_by_id_stub():
     original = real_settings.telethon_stub
@@ -1,23 +1,40 @@
 """Tests for Vespa client."""
 
+import gzip
+import json
+import httpx
 import pytest
 import asyncio
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from vespa_client import VespaClient
 from models import VespaDocument, IndexerMetrics
 
 
+def make_client(**overrides) -> VespaClient:
+    """Build a client against explicit settings.
+
+    Other test modules replace the ``settings`` module globally, so the
+    client must not read whatever happens to be installed there.
+    """
+    values = {
+        "vespa_endpoint": "http://vespa:8080",
+        "backoff_base_ms": 1,  # Fast retry for testing
+        "backoff_max_ms": 30000,
+        "vespa_compress_feed": False,
+        **overrides,
+    }
+    with patch("vespa_client.settings", SimpleNamespace(**values)):
+        return VespaClient()
+
+
 class TestVespaClient:
     """Test VespaClient class."""
 
     def setup_method(self):
         """Set up test fixtures."""
-        self.client = VespaClient()
+        self.client = make_client()
 
     def teardown_method(self):
         """Clean up after tests."""
@@ -40,6 +57,22 @@ class TestVespaClient:
         await self.client.close()
         mock_client.aclose.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_keepalive_warms_feed_endpoint(self):
+        """Test keepalive pings the feed port at once and stops on close."""
+        mock_client = AsyncMock()
+        self.client.client = mock_client
+
+        await self.client.start_keepalive()
+        task = self.client._keepalive_task
+
+        mock_client.get.assert_awaited_once_with(self.client.state_health_url)
+        assert ":19071" not in self.client.state_health_url
+
+        await self.client.close()
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
     @pytest.mark.asyncio
     async def test_feed_document_success(self):
         """Test successful document feeding."""
@@ -69,6 +102,39 @@ class TestVespaClient:
         assert self.client.metrics.vespa_feed_success == 1
         mock_client.post.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_feed_document_body(self):
+        """Test the encoded feed body matches Vespa's expected fields."""
+        doc = VespaDocument(
+            id="test:123:0:v1",
+            chat_id="test",
+            message_id=123,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+            vector_small={"values": [0.5, 0.25]},
+        )
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+
+        mock_client = AsyncMock()
+        mock_client.post.return_value = mock_response
+        self.client.client = mock_client
+
+        await self.client.feed_document(doc)
+
+        body = json.loads(mock_client.post.call_args.kwargs["content"])
+        fields = body["fields"]
+        assert fields["id"] == "test:123:0:v1"
+        assert fields["sender"] == ""
+        assert fields["edit_date"] is None
+        assert fields["date"] == 1692825600
+        assert fields["vector_small"] == {"values": "3F0000003E800000"}
+        assert "vector_large" not in fields
+        assert "deleted_at" not in fields
+
     @pytest.mark.asyncio
     async def test_feed_document_created_status(self):
         """Test document feeding with 201 Created status."""
@@ -114,6 +180,7 @@ class TestVespaClient:
         mock_response = MagicMock()
         mock_response.status_code = 500
         mock_response.text = "Internal Server Error"
+        mock_response.headers = {}
 
         mock_client = AsyncMock()
         mock_client.post.return_value = mock_response
@@ -128,6 +195,153 @@ class TestVespaClient:
             assert self.client.metrics.vespa_feed_failures == 1
             assert mock_client.post.call_count == 3  # Should retry 3 times
 
+    @pytest.mark.asyncio
+    async def test_feed_document_encodes_body_once(self):
+        """Test retries resend the same encoded body instead of re-encoding."""
+        doc = VespaDocument(
+            id="test:123:0:v1",
+            chat_id="test",
+            message_id=123,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+        )
+
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = [
+            MagicMock(status_code=503, text="Busy", headers={"Retry-After": "0"}),
+            MagicMock(status_code=200),
+        ]
+        self.client.client = mock_client
+
+        assert await self.client.feed_document(doc) is True
+
+        first, second = mock_client.post.call_args_list
+        assert first.kwargs["content"] is second.kwargs["content"]
+
+    @pytest.mark.asyncio
+    async def test_feed_document_compressed(self):
+        """Test feed bodies are gzipped and labelled when compression is on."""
+        doc = VespaDocument(
+            id="test:123:0:v1",
+            chat_id="test",
+            message_id=123,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+        )
+
+        client = make_client(vespa_compress_feed=True)
+
+        mock_client = AsyncMock()
+        mock_client.post.return_value = MagicMock(status_code=200)
+        client.client = mock_client
+
+        assert await client.feed_document(doc) is True
+
+        call = mock_client.post.call_args
+        assert call.kwargs["headers"]["Content-Encoding"] == "gzip"
+        body = json.loads(gzip.decompress(call.kwargs["content"]))
+        assert body["fields"]["message_id"] == 123
+
+    @pytest.mark.asyncio
+    async def test_feed_document_resends_on_dropped_connection(self):
+        """Test a dropped pooled connection is resent without using a retry."""
+        doc = VespaDocument(
+            id="test:123:0:v1",
+            chat_id="test",
+            message_id=123,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+        )
+
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = [
+            httpx.RemoteProtocolError("Server disconnected"),
+            MagicMock(status_code=200),
+        ]
+        self.client.client = mock_client
+
+        with patch("vespa_client.asyncio.sleep") as mock_sleep:
+            assert await self.client.feed_document(doc) is True
+
+        assert mock_client.post.call_count == 2
+        mock_sleep.assert_not_called()
+        assert self.client.metrics.vespa_feed_retries == 0
+
+    @pytest.mark.asyncio
+    async def test_feed_document_client_error_fails_fast(self):
+        """Test a 4xx rejection is not retried."""
+        doc = VespaDocument(
+            id="test:123:0:v1",
+            chat_id="test",
+            message_id=123,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+        )
+
+        mock_response = MagicMock()
+        mock_response.status_code = 400
+        mock_response.text = "Bad Request"
+
+        mock_client = AsyncMock()
+        mock_client.post.return_value = mock_response
+        self.client.client = mock_client
+
+        result = await self.client.feed_document(doc)
+
+        assert result is False
+        assert mock_client.post.call_count == 1
+        assert self.client.metrics.vespa_feed_retries == 0
+        assert self.client.metrics.vespa_feed_failures == 1
+
+    @pytest.mark.asyncio
+    async def test_feed_document_honors_retry_after(self):
+        """Test a throttled feed waits as long as Retry-After asks."""
+        doc = VespaDocument(
+            id="test:123:0:v1",
+            chat_id="test",
+            message_id=123,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+        )
+
+        throttled = MagicMock(status_code=429, text="Too Many Requests")
+        throttled.headers = {"Retry-After": "0.25"}
+        ok = MagicMock(status_code=200)
+
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = [throttled, ok]
+        self.client.client = mock_client
+
+        with patch("vespa_client.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            result = await self.client.feed_document(doc)
+
+        assert result is True
+        mock_sleep.assert_awaited_once_with(0.25)
+        assert self.client.metrics.vespa_feed_retries == 1
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Test backoff delays spread below the capped exponential delay."""
+        client = make_client(backoff_base_ms=100, backoff_max_ms=300)
+
+        first = [client._backoff_delay(0) for _ in range(200)]
+        later = [client._backoff_delay(3) for _ in range(200)]
+
+        # The first retry is jittered too, not pinned to the base delay
+        assert all(0 <= d <= 0.1 for d in first)
+        assert len(set(first)) > 1
+        assert all(0 <= d <= 0.3 for d in later)
+        assert max(later) > 0.1
+
     @pytest.mark.asyncio
     async def test_feed_document_exception_retry(self):
         """Test document feeding with exception and retry."""
@@ -237,6 +451,127 @@ class TestVespaClient:
         assert mock_client.post.call_count == 3
         assert self.client.metrics.vespa_feed_success == 3
 
+    @pytest.mark.asyncio
+    async def test_feed_documents_bounds_in_flight(self):
+        """Test feeding keeps at most `concurrency` requests in flight."""
+        docs = [
+            VespaDocument(
+                id=f"test:{i}:0:v1",
+                chat_id="test",
+                message_id=i,
+                chunk_idx=0,
+                message_date=1692825600,
+                text=f"Test message {i}",
+                bm25_text=f"Test message {i}",
+            )
+            for i in range(20)
+        ]
+        in_flight = 0
+        peak = 0
+
+        async def mock_post(url, content=None, headers=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            message_id = json.loads(content)["fields"]["message_id"]
+            # Every fourth document is rejected outright (not retried)
+            return MagicMock(status_code=400 if message_id % 4 == 0 else 200)
+
+        self.client.client = AsyncMock()
+        self.client.client.post = mock_post
+
+        result = await self.client.feed_documents(docs, concurrency=3)
+
+        assert result == 15
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_feed_documents_rejects_zero_concurrency(self):
+        """Test a non-positive concurrency fails instead of feeding nothing."""
+        doc = VespaDocument(
+            id="test:1:0:v1",
+            chat_id="test",
+            message_id=1,
+            chunk_idx=0,
+            message_date=1692825600,
+            text="Test message",
+            bm25_text="Test message",
+        )
+        self.client.client = AsyncMock()
+
+        with pytest.raises(ValueError):
+            await self.client.feed_documents([doc], concurrency=0)
+
+        self.client.client.post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_feed_documents_logs_progress(self, caplog):
+        """Test large feeds report progress before the batch finishes."""
+        docs = [
+            VespaDocument(
+                id=f"test:{i}:0:v1",
+                chat_id="test",
+                message_id=i,
+                chunk_idx=0,
+                message_date=1692825600,
+                text=f"Test message {i}",
+                bm25_text=f"Test message {i}",
+            )
+            for i in range(5)
+        ]
+
+        mock_client = AsyncMock()
+        mock_client.post.return_value = MagicMock(status_code=200)
+        self.client.client = mock_client
+
+        with patch("vespa_client.FEED_PROGRESS_EVERY", 2), caplog.at_level(
+            "INFO", logger="vespa_client"
+        ):
+            await self.client.feed_documents(docs, concurrency=1)
+
+        progress = [r.message for r in caplog.records if "so far" in r.message]
+        assert progress == [
+            "Fed 2/2 of 5 documents so far",
+            "Fed 4/4 of 5 documents so far",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_feed_documents_retry_does_not_block_feeder(self):
+        """Test a document waiting on backoff frees its feeder for others."""
+        docs = [
+            VespaDocument(
+                id=f"test:{i}:0:v1",
+                chat_id="test",
+                message_id=i,
+                chunk_idx=0,
+                message_date=1692825600,
+                text=f"Test message {i}",
+                bm25_text=f"Test message {i}",
+            )
+            for i in range(2)
+        ]
+        posted = []
+
+        async def mock_post(url, content=None, headers=None):
+            posted.append(url.rsplit("/", 1)[-1])
+            if len(posted) == 1:
+                throttled = MagicMock(status_code=503, text="Busy")
+                throttled.headers = {"Retry-After": "0.01"}
+                return throttled
+            return MagicMock(status_code=200)
+
+        self.client.client = AsyncMock()
+        self.client.client.post = mock_post
+
+        result = await self.client.feed_documents(docs, concurrency=1)
+
+        assert result == 2
+        assert posted == ["test:0:0:v1", "test:1:0:v1", "test:0:0:v1"]
+        assert self.client.metrics.vespa_feed_retries == 1
+        assert self.client.metrics.vespa_feed_success == 2
+
     @pytest.mark.asyncio
     async def test_feed_documents_partial_success(self):
         """Test feeding documents with partial success."""
@@ -264,6 +599,7 @@ class TestVespaClient:
             mock_response = MagicMock()
             if call_count == 2:  # Second call fails
                 mock_response.status_code = 500
+                mock_response.headers = {}
             else:
                 mock_response.status_code = 200
             return mock_response
@@ -313,6 +649,16 @@ class TestVespaClient:
 
         assert result is True  # 404 is considered success for deletion
 
+    @pytest.mark.asyncio
+    async def test_delete_document_accepted(self):
+        """Test async-accepted and no-content deletes count as success."""
+        mock_client = AsyncMock()
+        self.client.client = mock_client
+
+        for status in (202, 204):
+            mock_client.delete.return_value = MagicMock(status_code=status)
+            assert await self.client.delete_document("test:123:0:v1") is True
+
     @pytest.mark.asyncio
     async def test_delete_document_failure(self):
         """Test document deletion failure."""
@@ -378,6 +724,63 @@ class TestVespaClient:
         assert result >= 3  # At least 3 successful deletes
         assert call_count == 10  # Should try all 10 possible chunks
 
+    @pytest.mark.asyncio
+    async def test_delete_message_chunks_concurrently(self):
+        """Test chunk deletes are issued together rather than one by one."""
+        in_flight = 0
+        peak = 0
+
+        async def mock_delete(doc_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return True
+
+        with patch.object(self.client, "delete_document", side_effect=mock_delete):
+            result = await self.client.delete_message_chunks("test", 123)
+
+        assert result == 10
+        assert peak == 10
+
+    @pytest.mark.asyncio
+    async def test_delete_message_chunks_by_selection(self):
+        """Test selection delete follows continuations and sums the counts."""
+        first = MagicMock(status_code=200)
+        first.json.return_value = {"documentCount": 2, "continuation": "tok"}
+        second = MagicMock(status_code=200)
+        second.json.return_value = {"documentCount": 1}
+
+        mock_client = AsyncMock()
+        mock_client.delete.side_effect = [first, second]
+        self.client.client = mock_client
+
+        with patch("vespa_client.settings") as mock_settings:
+            mock_settings.vespa_content_cluster = "content"
+            result = await self.client.delete_message_chunks_by_selection('te"st', 123)
+
+        assert result == 3
+        assert mock_client.delete.call_count == 2
+        params = mock_client.delete.call_args_list[0].kwargs["params"]
+        assert params == {
+            "selection": 'message.chat_id=="te\\"st" and message.message_id==123',
+            "cluster": "content",
+        }
+        last_params = mock_client.delete.call_args_list[1].kwargs["params"]
+        assert last_params["continuation"] == "tok"
+
+    @pytest.mark.asyncio
+    async def test_delete_message_chunks_by_selection_rejected(self):
+        """Test a rejected selection delete reports None for fallback."""
+        mock_client = AsyncMock()
+        mock_client.delete.return_value = MagicMock(status_code=400, text="Bad")
+        self.client.client = mock_client
+
+        result = await self.client.delete_message_chunks_by_selection("test", 123)
+
+        assert result is None
+
     @pytest.mark.asyncio
     async def test_health_check_success(self):
         """Test successful health check."""
@@ -538,8 +941,8 @@ class TestVespaClient:
         # Capture the request to verify vector fields
         captured_request = {}
 
-        async def mock_post(url, json=None, headers=None):
-            captured_request.update(json or {})
+        async def mock_post(url, content=None, headers=None):
+            captured_request.update(json.loads(content))
             return mock_response
 
         mock_client.post = mock_post
@@ -557,13 +960,21 @@ class TestVespaClient:
         # Check vector_large presence and dimensions
         if expected_fields["has_vector_large"]:
             assert "vector_large" in fields
-            assert len(fields["vector_large"]["values"]) == expected_fields["large_dim"]
+            # Hex tensor form: 8 hex characters per float32 cell
+            assert (
+                len(fields["vector_large"]["values"])
+                == 8 * expected_fields["large_dim"]
+            )
         else:
             assert "vector_large" not in fields
 
         # Check vector_small presence and dimensions
         if expected_fields["has_vector_small"]:
             assert "vector_small" in fields
-            assert len(fields["vector_small"]["values"]) == expected_fields["small_dim"]
+            # Hex tensor form: 8 hex characters per float32 cell
+            assert (
+                len(fields["vector_small"]["values"])
+                == 8 * expected_fields["small_dim"]
+            )
         else:
             assert "vector_small" not in fields
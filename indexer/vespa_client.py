@@ -1,15 +1,88 @@
 """Vespa client for document feeding."""
 
 import asyncio
+import gzip
+import heapq
+import itertools
 import logging
-from typing import List, Dict, Any, Optional
-import json
+import random
+from typing import List, Dict, Any, Optional, Tuple
 import httpx
-from models import VespaDocument, IndexerMetrics
+import msgspec
+
+try:  # HTTP/2 needs the optional h2 package (httpx[http2])
+    import h2  # noqa: F401
+
+    _HTTP2 = True
+except ImportError:  # pragma: no cover - depends on environment
+    _HTTP2 = False
+from models import VespaDocument, VespaFields, IndexerMetrics
 from settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Feed requests kept in flight per feed_documents call
+FEED_CONCURRENCY = 16
+# Progress is logged every this many documents during a large feed
+FEED_PROGRESS_EVERY = 1000
+# Immediate re-dials when opening a connection fails, handled by the HTTP
+# transport
+CONNECT_RETRIES = 2
+# A pooled connection the server already closed fails with one of these; the
+# feed is resent once on a fresh connection before it counts as an attempt
+_DROPPED_CONNECTION_ERRORS = (
+    httpx.ReadError,
+    httpx.WriteError,
+    httpx.RemoteProtocolError,
+)
+# Feed attempts per document, and the statuses worth another attempt
+FEED_ATTEMPTS = 3
+RETRIABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Statuses meaning a put or delete took effect; 202 is an accepted async
+# operation, and a 404 delete means the document is already gone
+_FEED_OK = frozenset({200, 201, 202})
+_DELETE_OK = frozenset({200, 202, 204, 404})
+# Idle feed connections are pinged this often so they stay pooled; must be
+# below the pool's keepalive_expiry
+KEEPALIVE_INTERVAL_S = 20.0
+# Upper bound on a server-requested Retry-After wait
+MAX_RETRY_AFTER_S = 60.0
+
+
+class _VespaPut(msgspec.Struct):
+    """Body of a /document/v1 put request."""
+
+    fields: VespaFields
+
+
+_encoder = msgspec.json.Encoder()
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_GZIP_JSON_HEADERS = {**_JSON_HEADERS, "Content-Encoding": "gzip"}
+
+# Outcomes of a single feed attempt
+_FED = "fed"
+_REJECTED = "rejected"
+_RETRY = "retry"
+
+
+def _setting_ms(name: str, default: float) -> float:
+    """Read a millisecond setting as a float, falling back on bad values."""
+    try:
+        return float(getattr(settings, name, default))
+    except Exception:
+        return default
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Seconds requested by a ``Retry-After`` header, if it holds a number."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return min(max(float(value), 0.0), MAX_RETRY_AFTER_S)
+    except ValueError:
+        return None
+
 
 class VespaClient:
     """Client for feeding documents to Vespa."""
@@ -17,17 +90,66 @@ class VespaClient:
     def __init__(self):
         self.endpoint = settings.vespa_endpoint
         self.feed_url_base = f"{self.endpoint}/document/v1/default/message/docid"
+        self._feed_prefix = self.feed_url_base + "/"
+        self.state_health_url = f"{self.endpoint}/state/v1/health"
         self.metrics = IndexerMetrics()
 
-        # HTTP client with retries
+        # Backoff bounds in seconds; settings are fixed for the process
+        self._backoff_base_s = _setting_ms("backoff_base_ms", 500.0) / 1000
+        self._backoff_max_s = _setting_ms("backoff_max_ms", 30000.0) / 1000
+
+        # Gzipped feed bodies need a container that accepts Content-Encoding
+        self._compress_feed = settings.vespa_compress_feed
+        self._feed_headers = (
+            _GZIP_JSON_HEADERS if self._compress_feed else _JSON_HEADERS
+        )
+
+        # HTTP client; HTTP/2 multiplexes concurrent feeds over one connection
+        # where the endpoint negotiates it (TLS/ALPN). The transport re-dials
+        # failed connects itself; connections dropped mid-request are resent
+        # once by _attempt_feed.
         self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(30.0), limits=httpx.Limits(max_connections=10)
+            transport=httpx.AsyncHTTPTransport(
+                http2=_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=20,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=60,
+                ),
+                retries=CONNECT_RETRIES,
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
         )
+        self._keepalive_task: Optional[asyncio.Task] = None
 
     async def close(self):
         """Close HTTP client."""
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
         await self.client.aclose()
 
+    async def start_keepalive(self) -> None:
+        """Open a feed connection now and keep it from idling out of the pool.
+
+        ``health_check`` talks to the config server port, so without this the
+        first feed after startup or an idle gap pays for a fresh connection.
+        """
+        await self._ping_feed_endpoint()
+        if self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+    async def _keepalive_loop(self) -> None:
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL_S)
+            await self._ping_feed_endpoint()
+
+    async def _ping_feed_endpoint(self) -> None:
+        try:
+            await self.client.get(self.state_health_url)
+        except Exception as e:
+            logger.debug(f"Vespa keepalive ping failed: {e}")
+
     async def feed_document(self, doc: VespaDocument) -> bool:
         """
         Feed a single document to Vespa.
@@ -38,113 +160,167 @@ class VespaClient:
         Returns:
             True if successful, False otherwise
         """
-        doc_url = f"{self.feed_url_base}/{doc.id}"
-
-        # Prepare document for Vespa
-        vespa_fields = {
-            "id": doc.id,
-            "text": doc.text,
-            "bm25_text": doc.bm25_text,
-            "chat_id": doc.chat_id,
-            "message_id": doc.message_id,
-            "chunk_idx": doc.chunk_idx,
-            "source_title": doc.source_title or "",
-            "sender": doc.sender or "",
-            "sender_username": doc.sender_username or "",
-            "chat_username": doc.chat_username or "",
-            "chat_type": doc.chat_type or "",
-            "message_date": doc.message_date,
-            "edit_date": doc.edit_date,
-            "thread_id": doc.thread_id,
-            "has_link": doc.has_link,
-            "date": doc.message_date,  # For backward compatibility
-        }
-
-        # Add vector fields if present
-        if doc.vector_small:
-            vespa_fields["vector_small"] = doc.vector_small
-        if doc.vector_large:
-            vespa_fields["vector_large"] = doc.vector_large
-
-        vespa_doc = {"fields": vespa_fields}
-        # Retry with exponential backoff
-        for attempt in range(3):
-            try:
-                response = await self.client.post(
-                    doc_url,
-                    json=vespa_doc,
-                    headers={"Content-Type": "application/json"},
-                )
+        doc_url, body = self._encode_put(doc)
 
-                if response.status_code in [200, 201]:
-                    self.metrics.vespa_feed_success += 1
-                    return True
-                else:
-                    logger.warning(
-                        f"Vespa feed failed: {response.status_code} {response.text}"
-                    )
-            except Exception as e:
-                base_ms = getattr(settings, "backoff_base_ms", 500)
-                try:
-                    base_ms = float(base_ms)
-                except Exception:
-                    base_ms = 500.0
-                wait_time = (base_ms * (2**attempt)) / 1000
-                logger.warning(f"Vespa feed error (attempt {attempt + 1}): {e}")
-
-                if attempt < 2:
-                    self.metrics.vespa_feed_retries += 1
-                    await asyncio.sleep(wait_time)
-                else:
-                    self.metrics.vespa_feed_failures += 1
-                    return False
-            else:
-                # Non-success response path
-                if attempt < 2:
-                    self.metrics.vespa_feed_retries += 1
-                    base_ms = getattr(settings, "backoff_base_ms", 500)
-                    try:
-                        base_ms = float(base_ms)
-                    except Exception:
-                        base_ms = 500.0
-                    wait_time = (base_ms * (2**attempt)) / 1000
-                    await asyncio.sleep(wait_time)
-                else:
-                    self.metrics.vespa_feed_failures += 1
-                    return False
+        # Retry with exponential backoff; only transient failures are retried
+        for attempt in range(FEED_ATTEMPTS):
+            outcome, retry_after = await self._attempt_feed(doc_url, body, attempt)
+            delay = self._record_attempt(outcome, attempt, retry_after)
+            if delay is None:
+                return outcome == _FED
+            await asyncio.sleep(delay)
 
         return False
 
-    async def feed_documents(self, docs: List[VespaDocument]) -> int:
+    async def feed_documents(
+        self, docs: List[VespaDocument], concurrency: int = FEED_CONCURRENCY
+    ) -> int:
         """
         Feed multiple documents to Vespa with concurrency control.
 
         Args:
             docs: List of documents to feed
+            concurrency: Maximum number of feed requests in flight
 
         Returns:
             Number of successfully fed documents
+
+        Raises:
+            ValueError: If concurrency is less than 1
         """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
         if not docs:
             return 0
 
-        # Limit concurrency to avoid overwhelming Vespa
-        semaphore = asyncio.Semaphore(5)
-
-        async def feed_with_semaphore(doc: VespaDocument) -> bool:
-            async with semaphore:
-                return await self.feed_document(doc)
+        # A fixed set of feeders drains one shared iterator, so a large batch
+        # costs `concurrency` tasks rather than one task per document, and
+        # results are counted as they complete instead of buffered. Documents
+        # that need a retry wait in a shared queue instead of inside a feeder,
+        # so the feeders keep feeding while backoffs run out.
+        loop = asyncio.get_running_loop()
+        fresh = iter(docs)
+        waiting: List[Tuple[float, int, str, bytes, int]] = []  # heap by ready time
+        order = itertools.count()
+        success_count = 0
+        done_count = 0
+
+        async def feeder() -> None:
+            nonlocal success_count, done_count
+            while True:
+                if waiting and waiting[0][0] <= loop.time():
+                    _, _, doc_url, body, attempt = heapq.heappop(waiting)
+                else:
+                    doc = next(fresh, None)
+                    if doc is None:
+                        if not waiting:
+                            return
+                        await asyncio.sleep(max(waiting[0][0] - loop.time(), 0))
+                        continue
+                    attempt = 0
+                    try:
+                        doc_url, body = self._encode_put(doc)
+                    except Exception as e:
+                        logger.error(f"Vespa feed error for {doc.id}: {e}")
+                        self.metrics.vespa_feed_failures += 1
+                        done_count += 1
+                        continue
+
+                outcome, retry_after = await self._attempt_feed(doc_url, body, attempt)
+                delay = self._record_attempt(outcome, attempt, retry_after)
+                if delay is not None:
+                    ready_at = loop.time() + delay
+                    heapq.heappush(
+                        waiting, (ready_at, next(order), doc_url, body, attempt + 1)
+                    )
+                    continue
+
+                if outcome == _FED:
+                    success_count += 1
+                done_count += 1
+                if done_count % FEED_PROGRESS_EVERY == 0:
+                    logger.info(
+                        f"Fed {success_count}/{done_count} of {len(docs)} documents so far"
+                    )
 
-        # Feed all documents concurrently
-        tasks = [feed_with_semaphore(doc) for doc in docs]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        feeders = min(concurrency, len(docs))
+        await asyncio.gather(*(feeder() for _ in range(feeders)))
 
-        # Count successes
-        success_count = sum(1 for result in results if result is True)
         logger.info(f"Fed {success_count}/{len(docs)} documents to Vespa")
 
         return success_count
 
+    def _encode_put(self, doc: VespaDocument) -> Tuple[str, bytes]:
+        """Return the document URL and its JSON put body, encoded once."""
+        body = _encoder.encode(_VespaPut(fields=doc.to_vespa_fields()))
+        if self._compress_feed:
+            # Fastest level: most of the size win at a fraction of the CPU
+            body = gzip.compress(body, compresslevel=1, mtime=0)
+        return self._feed_prefix + doc.id, body
+
+    async def _attempt_feed(
+        self, doc_url: str, body: bytes, attempt: int
+    ) -> Tuple[str, Optional[float]]:
+        """
+        Make one feed attempt without sleeping.
+
+        Returns:
+            (outcome, retry_after): outcome is _FED, _REJECTED or _RETRY;
+            retry_after is the server's Retry-After in seconds, if it sent one
+        """
+        try:
+            try:
+                response = await self._post_feed(doc_url, body)
+            except _DROPPED_CONNECTION_ERRORS as e:
+                # Puts are idempotent, so resending right away is safe
+                logger.debug(f"Vespa feed connection dropped, resending: {e}")
+                response = await self._post_feed(doc_url, body)
+        except Exception as e:
+            logger.warning(f"Vespa feed error (attempt {attempt + 1}): {e}")
+            return _RETRY, None
+
+        if response.status_code in _FEED_OK:
+            return _FED, None
+
+        logger.warning(f"Vespa feed failed: {response.status_code} {response.text}")
+        if response.status_code not in RETRIABLE_STATUS_CODES:
+            # The same request will be rejected again; don't wait on it
+            return _REJECTED, None
+        return _RETRY, _retry_after_seconds(response)
+
+    async def _post_feed(self, doc_url: str, body: bytes) -> httpx.Response:
+        # post() reads the small JSON reply; a stream() left unread on
+        # success would keep httpx from returning the connection to
+        # the pool, costing a new connection per document.
+        return await self.client.post(
+            doc_url,
+            content=body,
+            headers=self._feed_headers,
+        )
+
+    def _record_attempt(
+        self, outcome: str, attempt: int, retry_after: Optional[float]
+    ) -> Optional[float]:
+        """Update feed metrics; return the delay before a retry, or None if done."""
+        if outcome == _FED:
+            self.metrics.vespa_feed_success += 1
+            return None
+        if outcome == _REJECTED or attempt == FEED_ATTEMPTS - 1:
+            self.metrics.vespa_feed_failures += 1
+            return None
+
+        self.metrics.vespa_feed_retries += 1
+        return retry_after if retry_after is not None else self._backoff_delay(attempt)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Jittered exponential backoff delay for a retry after ``attempt``.
+
+        Full jitter: drawn uniformly up to the capped exponential delay, so
+        documents failing together spread out from the first retry on.
+        """
+        high = min(self._backoff_base_s * (1 << attempt), self._backoff_max_s)
+        return random.uniform(0.0, high)
+
     async def delete_document(self, doc_id: str) -> bool:
         """
         Delete a document from Vespa.
@@ -155,12 +331,12 @@ class VespaClient:
         Returns:
             True if successful, False otherwise
         """
-        doc_url = f"{self.feed_url_base}/{doc_id}"
+        doc_url = self._feed_prefix + doc_id
 
         try:
             response = await self.client.delete(doc_url)
 
-            if response.status_code in [200, 404]:  # 404 is OK - already deleted
+            if response.status_code in _DELETE_OK:
                 return True
             else:
                 logger.warning(
@@ -183,13 +359,67 @@ class VespaClient:
         Returns:
             Number of deleted chunks
         """
-        # Since we don't know exactly how many chunks exist, we'll try a reasonable range
+        # Since we don't know exactly how many chunks exist, we'll try a reasonable
+        # range; the deletes are independent, so issue them concurrently
+        results = await asyncio.gather(
+            *(
+                self.delete_document(
+                    f"{chat_id}:{message_id}:{chunk_idx}:v{settings.chunking_version}"
+                )
+                for chunk_idx in range(10)  # Assume max 10 chunks per message
+            )
+        )
+        deleted_count = sum(results)
+
+        logger.info(f"Deleted {deleted_count} chunks for message {message_id}")
+        return deleted_count
+
+    async def delete_message_chunks_by_selection(
+        self, chat_id: str, message_id: int
+    ) -> Optional[int]:
+        """
+        Delete all chunks for a message with one selection-based request.
+
+        Unlike ``delete_message_chunks`` this does not assume a maximum number
+        of chunks and removes every chunking version of the message.
+
+        Args:
+            chat_id: Chat ID
+            message_id: Message ID
+
+        Returns:
+            Number of deleted chunks, or None if Vespa rejected the request
+            (callers can fall back to ``delete_message_chunks``)
+        """
+        escaped_chat_id = chat_id.replace("\\", "\\\\").replace('"', '\\"')
+        params = {
+            "selection": (
+                f'message.chat_id=="{escaped_chat_id}" and '
+                f"message.message_id=={int(message_id)}"
+            ),
+            "cluster": settings.vespa_content_cluster,
+        }
         deleted_count = 0
 
-        for chunk_idx in range(10):  # Assume max 10 chunks per message
-            doc_id = f"{chat_id}:{message_id}:{chunk_idx}:v{settings.chunking_version}"
-            if await self.delete_document(doc_id):
-                deleted_count += 1
+        try:
+            # Vespa visits in slices and hands back a continuation until done
+            while True:
+                response = await self.client.delete(self.feed_url_base, params=params)
+                if response.status_code != 200:
+                    logger.warning(
+                        f"Vespa selection delete failed: {response.status_code} {response.text}"
+                    )
+                    return None
+
+                payload = response.json()
+                deleted_count += payload.get("documentCount", 0)
+                continuation = payload.get("continuation")
+                if not continuation:
+                    break
+                params = {**params, "continuation": continuation}
+        except Exception as e:
+            logger.error(f"Vespa selection delete error: {e}")
+            return None
 
         logger.info(f"Deleted {deleted_count} chunks for message {message_id}")
         return deleted_count